@@ -1,13 +1,34 @@
+import logging
+import os
+import threading
+
 import dash
 import dash_table
 import dash_core_components as dcc
 import dash_html_components as html
-import plotly.express as px
+import numpy as np
+import plotly.graph_objects as go
 import pandas as pd
-from dash.dependencies import Input, Output
+from plotly.colors import qualitative
+from plotly.subplots import make_subplots
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+import httpcache
+import loader
+import metrics
+from downsample import downsample, lttb
+from figcache import FigureCache
+from figures import FrozenFigure, webgl_rows
+from mapframes import encodeFrames
+from metrics import phase
+from sharedcache import SqliteStore, sourceHash
+from tablequery import pageRecords
+from warmup import WarmUp
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
+logging.basicConfig(level = logging.INFO, format = '%(asctime)s %(name)s %(levelname)s %(message)s')
+
 colors = {
     'background': '#2D2D2D',
     'text': '#E1E2E5',
@@ -34,32 +55,137 @@ boxBorderStyle = {
                   'margin-right' : '15%'
                                  }
 
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+#Callbacks of the country section are registered before its components exist, see loadCountrySection.
+#This also keeps dash from building the layout at import just to validate it.
+app = dash.Dash(__name__, external_stylesheets=external_stylesheets, suppress_callback_exceptions=True)
+
+#Callbacks are timed from here on and exposed on /metrics, PROFILE_SLOW_MS logs sampled
+#stacks of callbacks slower than that many milliseconds
+slow_ms = int(os.environ.get('PROFILE_SLOW_MS', 0))
+metrics.instrument(app, slow_seconds = slow_ms / 1000 if slow_ms else None)
+
+#SERIES_BACKEND=sqlite keeps the frame of every dataset version in an SQLite file in SERIES_DB_DIR,
+#which the plots query a country at a time, instead of in memory (SERIES_BACKEND=pandas)
+series_backend = os.environ.get('SERIES_BACKEND', 'pandas')
+if series_backend not in ('pandas', 'sqlite'):
+    raise ValueError("unknown series backend %r" % series_backend)
+series_dir = os.environ.get('SERIES_DB_DIR', '.') if series_backend == 'sqlite' else None
+
+#DATA_DELTA_DIR names a folder whose daily CSV files are appended without reparsing data.csv.
+#Nothing is read at import, the first request (or prepare()) loads data.csv.
+dataset = loader.Dataset("data.csv", delta_dir = os.environ.get('DATA_DELTA_DIR'), lazy = True, series_dir = series_dir)
+
+#FIGURE_CACHE_PATH names an SQLite file every worker on the host reads figures from and adds them to,
+#namespaced by the app's source so a deploy does not serve figures drawn by the old code
+figure_store = None
+if os.environ.get('FIGURE_CACHE_PATH'):
+    figure_store = SqliteStore(os.environ['FIGURE_CACHE_PATH'],
+                               max_bytes = int(os.environ.get('FIGURE_CACHE_SHARED_BYTES', 256 * 1024 * 1024)),
+                               namespace = sourceHash(os.path.dirname(os.path.abspath(__file__))))
+
+figure_cache = FigureCache(max_entries = int(os.environ.get('FIGURE_CACHE_ENTRIES', 256)),
+                           max_bytes = int(os.environ.get('FIGURE_CACHE_BYTES', 64 * 1024 * 1024)),
+                           store = figure_store)
+
+def rebaseFigures(snapshot):
+    if snapshot.changed is None:
+        figure_cache.reset(snapshot.version)
+    else:
+        #Only figures of countries that got new rows are rebuilt, the main plot and the map always are.
+        #Derived metrics up to the last day are too, new days carry every country's totals into them.
+        figure_cache.rebase(snapshot.version, lambda key: key[0] not in ('main', 'map') and key[0] not in snapshot.changed
+                            and not (key[3] is None and key[1] in loader.DailyTable.derived))
+
+dataset.onSwap(rebaseFigures)
+
+#Callback and layout responses carry ETags of the dataset version and go out compressed,
+#identical requests of other visitors are answered from RESPONSE_CACHE_BYTES of bodies
+response_cache = httpcache.ResponseCache(max_bytes = int(os.environ.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024)))
+dataset.onSwap(lambda snapshot: response_cache.reset(snapshot.version))
+httpcache.install(app, lambda: dataset.current().version, response_cache)
+
+metrics.registry.gauge('dash_figure_cache', lambda: {(('stat', k),): v for k, v in figure_cache.stats().items()})
+metrics.registry.gauge('dash_response_cache', lambda: {(('stat', k),): v for k, v in response_cache.stats().items()})
+metrics.registry.gauge('dash_dataset_column_bytes',
+                       lambda: {(('column', col),): int(size) for col, size in dataset.current().memory.items()})
 
-data = pd.read_csv("data.csv", parse_dates=['date'], usecols =[1,2,3,4,5,7,8,10,11,13,14,34,35,47])
-data.drop(data[data['continent'].isnull()].index, inplace = True)
-data.drop(data[(data['new_cases'].isnull()) & (data['total_cases'].isnull())].index, inplace = True)
+#Seconds between checks of data.csv for a new version, 0 turns hot reloading off. The watcher is
+#started by __main__ or, under gunicorn, by post_fork in every worker, never at import: the preloaded
+#master would otherwise reparse data.csv on its own and could fork while a reload holds the locks.
+reload_interval = int(os.environ.get('DATA_RELOAD_INTERVAL', 60))
 
-groups = data.groupby('location')
+#(graph, radio, metric dropdown, column, color) of the three country plots
+country_plots = [('total-cases-country-plot', 'totalCases_radio', 'totalCases_metric', 'total_cases', '#3CA4FF'),
+                 ('new-cases-country-plot', 'newCases_radio', 'newCases_metric', 'new_cases', '#1736e3'),
+                 ('death-line-country-plot', 'totalDeaths_radio', 'totalDeaths_metric', 'total_deaths', '#BB2205')]
 
-df_pop = groups.agg({'population':'max','total_cases':'max','total_deaths':'max'})
-temp_df_pop = df_pop.reset_index()
+#Metrics a country plot can switch to, its column and what the daily table derives from it
+country_metrics = {col: [col] + [name for name, (source, function) in loader.DailyTable.derived.items() if source == col]
+                   for graph, radio, dropdown, col, color in country_plots}
 
-x = df_pop[['total_cases','total_deaths']]
+metric_labels = {'new_cases_avg7': 'New Cases 7 Day Avg',
+                 'new_cases_avg14': 'New Cases 14 Day Avg',
+                 'new_deaths_avg7': 'New Deaths 7 Day Avg',
+                 'new_deaths_avg14': 'New Deaths 14 Day Avg',
+                 'total_cases_growth': 'Case Growth %',
+                 'total_cases_doubling': 'Case Doubling Days',
+                 'total_deaths_growth': 'Death Growth %',
+                 'total_deaths_doubling': 'Death Doubling Days'}
 
-x.reset_index(inplace = True)
-x.columns = ['Country', "Total Cases", "Total Deaths"]
-x.sort_values("Total Cases",ascending = False, inplace = True)
-x.reset_index(drop = True, inplace = True)
+#Rows of the countries table sent per page
+table_page_size = 15
 
-top_ten = x[:10]
+#Share of the page width taken by the main plot and by each country plot
+main_plot_width = 0.65
+country_plot_width = 0.3
 
-countries = data.location.unique()
-ten_count = top_ten.Country
-selected_country = x.loc[0].Country
+def pointBudget(viewport, share):
+    #About one point per horizontal pixel, rounded so nearby window sizes share cache entries
+    viewport = viewport or 1920
+    return max(100, int(viewport * share) // 100 * 100)
 
-def getMainPlot():
-    fig = px.line(data.query("location in @ten_count"), x="date", y="total_cases", color = "location", color_discrete_sequence =["#e3f2fd","#bbdefb","#90caf9","#64b5f6","#42a5f5",'#2196f3','#1e88e5','#1976d2','#1565c0','#0d47a1'])
+def dateKey(date):
+    return None if date is None else pd.Timestamp(date).date().isoformat()
+
+def rangeKeys(snap, start_date, end_date):
+    #Ends at or past the first or last day of the snapshot are keyed as open, so the default range
+    #does not move with every delta and figures of the countries it did not touch keep their keys
+    start_date, end_date = dateKey(start_date), dateKey(end_date)
+    if start_date is not None and start_date <= dateKey(snap.daily.dates[0]):
+        start_date = None
+    if end_date is not None and end_date >= dateKey(snap.as_of):
+        end_date = None
+    return start_date, end_date
+
+def getMainPlot(snap, start_date = None, end_date = None, budget = 1200):
+    with phase('slice'):
+        temp = pd.concat([downsample(snap.series.country(country, ['total_cases'], start_date, end_date), 'total_cases', budget)
+                          for country in sorted(snap.top_ten.Country)])
+    with phase('figure'):
+        return mainFigure(temp)
+
+#FrozenFigure of every kind of figure built so far, see mainFigure and countryFigure
+frozen_figures = {}
+
+def mainFigure(temp):
+    #plotly.express builds the first figure of a kind, later ones only get their traces filled in
+    countries = temp['location'].astype(str).to_numpy()
+    starts = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]])
+    key = ('main', len(starts), len(temp) > webgl_rows)
+    if key not in frozen_figures:
+        fig = pxMainFigure(temp)
+        frozen_figures[key] = FrozenFigure(fig)
+        return fig
+    dates, values = temp['date'].to_numpy(), temp['total_cases'].to_numpy()
+    stops = np.r_[starts[1:], len(temp)]
+    return frozen_figures[key].fill([{'legendgroup': countries[start], 'name': countries[start],
+                                      'x': dates[start:stop], 'y': values[start:stop]}
+                                     for start, stop in zip(starts, stops)])
+
+def pxMainFigure(temp):
+    #plotly.express is imported by the first figure instead of with the app, see prepare()
+    import plotly.express as px
+    fig = px.line(temp, x="date", y="total_cases", color = "location", color_discrete_sequence =["#e3f2fd","#bbdefb","#90caf9","#64b5f6","#42a5f5",'#2196f3','#1e88e5','#1976d2','#1565c0','#0d47a1'])
     fig.update_traces(hovertemplate=None)
     fig.update_xaxes(showgrid=True, gridwidth=2, gridcolor='#363636')
     fig.update_yaxes(showgrid=True, gridwidth=2, gridcolor='#363636')
@@ -87,211 +213,438 @@ def getMainPlot():
                         ))
     return fig
 
-app.layout = html.Div(style={'backgroundColor': colors['background']}, children=[
-    html.H1(children='COVID DashBoard',
-            style={'textAlign': 'center',
-                   'color': colors['text'],
-                   'font-family':'Courier New, monospace',
-                   'padding-top' : '1%',
-                   'margin-bottom' : '1%'}, 
-            className = 'row'),
-    html.H2(children = 'Showing data for 2nd November 2020',
-            style={'textAlign': 'center',
-                   'color': colors['text'],
-                   'font-family':'Courier New, monospace',
-                   'margin-top' : '1%',
-                   'margin-bottom' : '1%',
-                   'padding-bottom' : '1%'}, 
-            className = 'row'),
-    html.Div([
-                html.Div([html.H4("Worldwide Total Cases : ",
-                                 style={'color': colors['confirmed_text']}),
-
-                         html.P(f"{int(x['Total Cases'].sum()):,d}", 
-                               style={'font':30,
-                                     'color': colors['confirmed_text']}),
-
-                         html.P(f"Increase in total cases in the past 24 Hrs : {int(data[data['date'] == '2020-11-02'].new_cases.sum()):,d} "+"("+str(round(int(data[data['date'] == '2020-11-02'].new_cases.sum())/int(x['Total Cases'].sum())*100, 3))+"%)",
-                               style={'color': colors['confirmed_text']})
-                         ],style=divBorderStyle,className='four columns'),
-
-
-                 html.Div([html.H4("Worldwide Total Deaths : ",
-                                 style={'color': colors['deaths_text']}),
-
-                         html.P(f"{int(x['Total Deaths'].sum()):,d}", 
-                               style={'font':30,
-                                     'color': colors['deaths_text']}),
-
-                         html.P(f"Increase in total deaths in the past 24 Hrs : {int(data[data['date'] == '2020-11-02'].new_deaths.sum()):,d} "+"("+str(round(int(data[data['date'] == '2020-11-02'].new_deaths.sum())/int(x['Total Cases'].sum())*100, 3))+"%)",
-                               style={'color': colors['deaths_text']
-                                     })
-                         ],style=divBorderStyle,className='four columns'),
+#Share of the page width taken by the comparison plot
+compare_plot_width = 0.95
+
+#Metric of the map tabs -> (label, colorscale), both are shown per million people
+map_metrics = {'total_cases': ('Cases Per Million', [[0, colors['highest_case_bg']], [1, colors['confirmed_text']]]),
+               'total_deaths': ('Deaths Per Million', [[0, colors['highest_case_bg']], [1, colors['deaths_text']]])}
+map_step_ms = 200
+
+mapTabStyle = {'backgroundColor': colors['background'], 'color': colors['figure_text'], 'borderColor': '#393939'}
+mapTabSelectedStyle = dict(mapTabStyle, borderTop = '2px solid ' + colors['figure_text'])
+
+def mapMarks(dates):
+    #A mark at the first day of every month, fewer when the dates span more than two years
+    months = pd.DatetimeIndex(dates).to_period('M')
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    every = max(1, len(starts) // 24 + 1)
+    return {int(row): {'label': months[row].strftime('%b %y'), 'style': {'color': colors['figure_text']}}
+            for row in starts[::every]}
+
+def compareMetrics(snap):
+    #Every column and derived matrix of the daily table, the running totals also per million people
+    return (snap.daily.columns + list(snap.daily.derived) +
+            [name + '_per_million' for name in snap.daily.cumulative])
+
+def metricLabel(metric):
+    return metric_labels.get(metric, metric.replace('_', ' ').title())
+
+def buildLayout(snap):
+    x = snap.x
+    return html.Div(style={'backgroundColor': colors['background']}, children=[
+        html.H1(children='COVID DashBoard',
+                style={'textAlign': 'center',
+                       'color': colors['text'],
+                       'font-family':'Courier New, monospace',
+                       'padding-top' : '1%',
+                       'margin-bottom' : '1%'}, 
+                className = 'row'),
+        html.H2(id = 'as-of-header',
+                style={'textAlign': 'center',
+                       'color': colors['text'],
+                       'font-family':'Courier New, monospace',
+                       'margin-top' : '1%',
+                       'margin-bottom' : '1%',
+                       'padding-bottom' : '1%'}, 
+                className = 'row'),
+        html.Div([dcc.DatePickerSingle(
+                        id = 'as-of-date',
+                        min_date_allowed = pd.Timestamp(snap.daily.dates[0]).date(),
+                        max_date_allowed = snap.as_of.date(),
+                        date = snap.as_of.date(),
+                        display_format = 'Do MMMM YYYY')],
+                 style={'textAlign': 'center', 'margin-bottom' : '1%'},
+                 className = 'row'),
+        html.Div([dcc.DatePickerRange(
+                        id = 'date-range',
+                        min_date_allowed = pd.Timestamp(snap.daily.dates[0]).date(),
+                        max_date_allowed = snap.as_of.date(),
+                        start_date = pd.Timestamp(snap.daily.dates[0]).date(),
+                        end_date = snap.as_of.date(),
+                        display_format = 'Do MMM YYYY')],
+                 style={'textAlign': 'center', 'margin-bottom' : '1%'},
+                 className = 'row'),
+        dcc.Location(id = 'url'),
+        dcc.Store(id = 'viewport'),
+        dcc.Store(id = 'selected-country'),
+        html.Div([
+                    html.Div([html.H4("Worldwide Total Cases : ",
+                                     style={'color': colors['confirmed_text']}),
+
+                             html.P(id = 'world_cases',
+                                   style={'font':30,
+                                         'color': colors['confirmed_text']}),
+
+                             html.P(id = 'world_new_cases',
+                                   style={'color': colors['confirmed_text']})
+                             ],style=divBorderStyle,className='four columns'),
+
+
+                     html.Div([html.H4("Worldwide Total Deaths : ",
+                                     style={'color': colors['deaths_text']}),
+
+                             html.P(id = 'world_deaths',
+                                   style={'font':30,
+                                         'color': colors['deaths_text']}),
+
+                             html.P(id = 'world_new_deaths',
+                                   style={'color': colors['deaths_text']
+                                         })
+                             ],style=divBorderStyle,className='four columns'),
         
-                html.Div([
-                        html.H6(children='Total Cases Per Million : ' + 
-                                "%8.2f"%(round((df_pop.total_cases.sum()/df_pop.population.sum())*1000000,2)),
-                               style={'color': colors['confirmed_text'],
-                                   'margin-top': '20px',
-                                   'margin-bottom':'20px'}
-                               ),
-                        html.H6(children='Total Deaths Per Million : ' + 
-                                "%8.2f"%(round((df_pop.total_deaths.sum()/df_pop.population.sum())*1000000,2)),
-                               style={'color': colors['deaths_text'],
-                                   'margin-top': '20px',
-                                   'margin-bottom':'20px'
-                               })
-                        ],style=divBorderStyle,className='four columns')
-    ], className = 'row'),
+                    html.Div([
+                            html.H6(id = 'world_cases_per_million',
+                                   style={'color': colors['confirmed_text'],
+                                       'margin-top': '20px',
+                                       'margin-bottom':'20px'}
+                                   ),
+                            html.H6(id = 'world_deaths_per_million',
+                                   style={'color': colors['deaths_text'],
+                                       'margin-top': '20px',
+                                       'margin-bottom':'20px'
+                                   })
+                            ],style=divBorderStyle,className='four columns')
+        ], className = 'row'),
        
-    html.Div([
         html.Div([
-              dcc.Graph(
-              id='daily-count',
-              figure=getMainPlot())
-        ],style={'width': '65%', 'display': 'inline-block', 'float': 'left',
-                  'margin-left' : '2.5%',
-                  'margin-right' : '2.5%'}),
-        html.Div([dash_table.DataTable(
-                                    id='countries',
-                                    columns=[{"name": i, "id": i, "deletable": False, "selectable": True} for i in x.columns],
-                                    fixed_rows={'headers': True, 'data': 0},
-                                    data=x.to_dict('records'),
-                                    sort_action='native',
-                                    filter_action='native',
-                                    row_selectable='single',
+            html.Div([
+                  dcc.Graph(
+                  id='daily-count')
+            ],style={'width': '65%', 'display': 'inline-block', 'float': 'left',
+                      'margin-left' : '2.5%',
+                      'margin-right' : '2.5%'}),
+            html.Div([dash_table.DataTable(
+                                        id='countries',
+                                        columns=[{"name": i, "id": i, "deletable": False, "selectable": True} for i in x.columns],
+                                        fixed_rows={'headers': True, 'data': 0},
+                                        page_action='custom',
+                                        page_current=0,
+                                        page_size=table_page_size,
+                                        sort_action='custom',
+                                        sort_mode='single',
+                                        sort_by=[],
+                                        filter_action='custom',
+                                        filter_query='',
+                                        row_selectable='single',
                                     
-                                    style_header={
-                                                  'backgroundColor': 'rgb(30, 30, 30)',
-                                                  'fontWeight': 'bold'
-                                                  },
-                                    style_cell={
-                                                'backgroundColor': 'rgb(100, 100, 100)',
-                                                'color': colors['text'],
-                                                'maxWidth': 0,
-                                                'fontSize':14},
-                                    style_table={
-                                                 'maxHeight': '450px',
-                                                 'overflow-y': 'auto'
-                                                },
-                                    style_data={
-                                                'whiteSpace': 'normal',
-                                                'height': 'auto',
-                                                },
-                                    style_data_conditional=[
-                                                {
-                                                    'if': {'row_index': 'even'},
-                                                    'backgroundColor': 'rgb(60, 60, 60)',
-                                                },
-                                                {
-                                                    'if': {'column_id' : 'Total Cases'},
-                                                    'color':colors['confirmed_text'],
-                                                    'fontWeight': 'bold'
-                                                },
-                                                {
-                                                    'if': {'column_id' : 'Total Deaths'},
-                                                    'color':colors['deaths_text'],
-                                                    'fontWeight': 'bold'
-                                                }
-                                                ])
-                                    ],
-                 style={'width': '25%', 'display': 'inline-block',
-                       'margin-left' : '2.5%',
-                      'margin-right' : '2.5%'})
-    ], className = 'row', style = {'margin-top': '2%'}),
-   
-    html.Div([html.H2(id = 'countryHeader')], 
-             id = 'countryName', 
-             style={'font-family':'Courier New, monospace', 
-                    'text-align':'center',
-                    'color' : colors['figure_text']
-                   }, className = 'row'),
+                                        style_header={
+                                                      'backgroundColor': 'rgb(30, 30, 30)',
+                                                      'fontWeight': 'bold'
+                                                      },
+                                        style_cell={
+                                                    'backgroundColor': 'rgb(100, 100, 100)',
+                                                    'color': colors['text'],
+                                                    'maxWidth': 0,
+                                                    'fontSize':14},
+                                        style_table={
+                                                     'maxHeight': '450px',
+                                                     'overflow-y': 'auto'
+                                                    },
+                                        style_data={
+                                                    'whiteSpace': 'normal',
+                                                    'height': 'auto',
+                                                    },
+                                        style_data_conditional=[
+                                                    {
+                                                        'if': {'row_index': 'even'},
+                                                        'backgroundColor': 'rgb(60, 60, 60)',
+                                                    },
+                                                    {
+                                                        'if': {'column_id' : 'Total Cases'},
+                                                        'color':colors['confirmed_text'],
+                                                        'fontWeight': 'bold'
+                                                    },
+                                                    {
+                                                        'if': {'column_id' : 'Total Deaths'},
+                                                        'color':colors['deaths_text'],
+                                                        'fontWeight': 'bold'
+                                                    }
+                                                    ])
+                                        ],
+                     style={'width': '25%', 'display': 'inline-block',
+                           'margin-left' : '2.5%',
+                          'margin-right' : '2.5%'})
+        ], className = 'row', style = {'margin-top': '2%'}),
+
+        #Country details and the comparison come in with loadCountrySection after the first paint
+        html.Div(id = 'country-section')
+    ], className = 'all_cols')
+
+def countrySection(snap):
+    x = snap.x
+    return [
+        html.Div([html.H2(id = 'countryHeader')], 
+                 id = 'countryName', 
+                 style={'font-family':'Courier New, monospace', 
+                        'text-align':'center',
+                        'color' : colors['figure_text']
+                       }, className = 'row'),
     
-    html.Div([
-                html.Div([html.H3("Cases : ",
-                                 style={'color': '#2f25f7',
-                                        'backgroundColor':'rgba(23, 54, 227, 0.2)',
-                                        'borderColor' : '#393939',
-                                        'borderStyle': 'solid',
-                                        'borderRadius': '10px',
-                                        'borderWidth':2}),
-                          html.Div([
-                                html.P([
-                                    html.Span("Total Cases : ", style = {'color':colors['figure_text'],
-                                                                         'font-size' : 22}),
-                                    html.Span(id = 'country_cases', style = {'color' : '#2f4eeb',
-                                                                            'font-size' : 20}),
-                                    html.Span(id = 'country_prev_day_cases', style = {'color' : '#382feb', 
-                                                                                      'font-weight': 'bold',
-                                                                                     'font-size' : 22})
-                                ], style = {'text-align':'center'}),
-                                html.P([
-                                    html.Span("Cases Per Million : ", style = {'color':colors['figure_text'],
-                                                                              'font-size' : 18}),
-                                    html.Span(id = 'country_per_million_cases', style = {'color' : '#2f4eeb',
-                                                                                        'font-size' : 16})
-                                ], style = {'text-align':'center'})
-                            ])
-                         ],style=boxBorderStyle, className="three columns"),
-
-
-                 html.Div([html.H3("Deaths : ",
-                                 style={'color': colors['deaths_text'],
-                                        'backgroundColor':'rgba(171, 44, 26, 0.5)',
-                                        'borderColor' : '#393939',
-                                        'borderStyle': 'solid',
-                                        'borderRadius': '10px',
-                                        'borderWidth':2}),
-                           html.Div([
-                                html.P([
-                                    html.Span("Total Deaths : ", style = {'color':colors['figure_text'],
-                                                                         'font-size' : 22}),
-                                    html.Span(id = 'country_deaths', style = {'color' : '#ff4f4f',
-                                                                             'font-size' : 20}),
-                                    html.Span(id = 'country_prev_day_deaths', style = {'color' : 'red',
-                                                                                      'fontWeight': 'bold',
-                                                                                      'font-size' : 22})
-                                ], style = {'text-align':'center'}),
-                                html.P([
-                                    html.Span("Deaths Per Million : ", style = {'color':colors['figure_text'],
-                                                                               'font-size' : 18}),
-                                    html.Span(id = 'country_per_million_deaths', style = {'color' : '#ff4f4f',
-                                                                                         'font-size' : 16})
-                                ], style = {'text-align':'center'})
-                            ])
-                         ],style=boxBorderStyle, className="three columns")
-    ], className = 'row'),
+        html.Div([
+                    html.Div([html.H3("Cases : ",
+                                     style={'color': '#2f25f7',
+                                            'backgroundColor':'rgba(23, 54, 227, 0.2)',
+                                            'borderColor' : '#393939',
+                                            'borderStyle': 'solid',
+                                            'borderRadius': '10px',
+                                            'borderWidth':2}),
+                              html.Div([
+                                    html.P([
+                                        html.Span("Total Cases : ", style = {'color':colors['figure_text'],
+                                                                             'font-size' : 22}),
+                                        html.Span(id = 'country_cases', style = {'color' : '#2f4eeb',
+                                                                                'font-size' : 20}),
+                                        html.Span(id = 'country_prev_day_cases', style = {'color' : '#382feb', 
+                                                                                          'font-weight': 'bold',
+                                                                                         'font-size' : 22})
+                                    ], style = {'text-align':'center'}),
+                                    html.P([
+                                        html.Span("Cases Per Million : ", style = {'color':colors['figure_text'],
+                                                                                  'font-size' : 18}),
+                                        html.Span(id = 'country_per_million_cases', style = {'color' : '#2f4eeb',
+                                                                                            'font-size' : 16})
+                                    ], style = {'text-align':'center'})
+                                ])
+                             ],style=boxBorderStyle, className="three columns"),
+
+
+                     html.Div([html.H3("Deaths : ",
+                                     style={'color': colors['deaths_text'],
+                                            'backgroundColor':'rgba(171, 44, 26, 0.5)',
+                                            'borderColor' : '#393939',
+                                            'borderStyle': 'solid',
+                                            'borderRadius': '10px',
+                                            'borderWidth':2}),
+                               html.Div([
+                                    html.P([
+                                        html.Span("Total Deaths : ", style = {'color':colors['figure_text'],
+                                                                             'font-size' : 22}),
+                                        html.Span(id = 'country_deaths', style = {'color' : '#ff4f4f',
+                                                                                 'font-size' : 20}),
+                                        html.Span(id = 'country_prev_day_deaths', style = {'color' : 'red',
+                                                                                          'fontWeight': 'bold',
+                                                                                          'font-size' : 22})
+                                    ], style = {'text-align':'center'}),
+                                    html.P([
+                                        html.Span("Deaths Per Million : ", style = {'color':colors['figure_text'],
+                                                                                   'font-size' : 18}),
+                                        html.Span(id = 'country_per_million_deaths', style = {'color' : '#ff4f4f',
+                                                                                             'font-size' : 16})
+                                    ], style = {'text-align':'center'})
+                                ])
+                             ],style=boxBorderStyle, className="three columns")
+        ], className = 'row'),
     
-    html.Div([
-        html.Div([dcc.RadioItems(
-                    options = [{'label': 'Line Plot', 'value': 'line'},
-                               {'label': 'Bar Plot', 'value': 'bar'}],
-                    value = 'line',
-                    labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
-                    id = 'totalCases_radio')
-                  ,dcc.Graph(id='total-cases-country-plot')], 
-                 className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-left':'2%'}),
+        html.Div([dcc.Store(id = graph + '-figure') for graph, radio, dropdown, col, color in country_plots]),
+    
+        html.Div([
+            html.Div([dcc.RadioItems(
+                        options = [{'label': 'Line Plot', 'value': 'line'},
+                                   {'label': 'Bar Plot', 'value': 'bar'}],
+                        value = 'line',
+                        labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
+                        id = 'totalCases_radio'),
+                      dcc.Dropdown(
+                        id = 'totalCases_metric',
+                        options = [{'label': metricLabel(metric), 'value': metric} for metric in country_metrics['total_cases']],
+                        value = 'total_cases',
+                        clearable = False)
+                      ,dcc.Graph(id='total-cases-country-plot')], 
+                     className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-left':'2%'}),
         
-        html.Div([dcc.RadioItems(
-                    options = [{'label': 'Line Plot', 'value': 'line'},
-                               {'label': 'Bar Plot', 'value': 'bar'}],
-                    value = 'line',
-                    labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
-                    id = 'newCases_radio')
-                  ,dcc.Graph(id='new-cases-country-plot')], 
-                 className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-left':'3%', 'margin-right':'3%'}),
+            html.Div([dcc.RadioItems(
+                        options = [{'label': 'Line Plot', 'value': 'line'},
+                                   {'label': 'Bar Plot', 'value': 'bar'}],
+                        value = 'line',
+                        labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
+                        id = 'newCases_radio'),
+                      dcc.Dropdown(
+                        id = 'newCases_metric',
+                        options = [{'label': metricLabel(metric), 'value': metric} for metric in country_metrics['new_cases']],
+                        value = 'new_cases',
+                        clearable = False)
+                      ,dcc.Graph(id='new-cases-country-plot')], 
+                     className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-left':'3%', 'margin-right':'3%'}),
         
-        html.Div([dcc.RadioItems(
-                    options = [{'label': 'Line Plot', 'value': 'line'},
-                               {'label': 'Bar Plot', 'value': 'bar'}],
-                    value = 'line',
-                    labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
-                    id = 'totalDeaths_radio')
-                  ,dcc.Graph(id='death-line-country-plot')], 
-                 className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-right':'2%'})] 
-        , className = 'row', style = {'margin-top': '2%',
-                                      'padding-bottom' : '2%'})
-], className = 'all_cols')
+            html.Div([dcc.RadioItems(
+                        options = [{'label': 'Line Plot', 'value': 'line'},
+                                   {'label': 'Bar Plot', 'value': 'bar'}],
+                        value = 'line',
+                        labelStyle={'display': 'inline-block', 'color':colors['figure_text']},
+                        id = 'totalDeaths_radio'),
+                      dcc.Dropdown(
+                        id = 'totalDeaths_metric',
+                        options = [{'label': metricLabel(metric), 'value': metric} for metric in country_metrics['total_deaths']],
+                        value = 'total_deaths',
+                        clearable = False)
+                      ,dcc.Graph(id='death-line-country-plot')], 
+                     className = 'eachCountry',style={'width': '30%','display': 'inline-block', 'margin-right':'2%'})] 
+            , className = 'row', style = {'margin-top': '2%',
+                                          'padding-bottom' : '2%'}),
+
+        html.Div([html.H2("Compare Countries")],
+                 style={'font-family':'Courier New, monospace',
+                        'text-align':'center',
+                        'color' : colors['figure_text']
+                       }, className = 'row'),
+
+        html.Div([
+            html.Div([dcc.Dropdown(
+                        id = 'compare-countries',
+                        options = [{'label': country, 'value': country} for country in sorted(x.Country)],
+                        value = list(x.Country[:5]),
+                        multi = True)],
+                     style={'width': '60%', 'display': 'inline-block', 'margin-left':'2.5%'}),
+            html.Div([dcc.Dropdown(
+                        id = 'compare-metrics',
+                        options = [{'label': metricLabel(metric), 'value': metric} for metric in compareMetrics(snap)],
+                        value = ['total_cases'],
+                        multi = True)],
+                     style={'width': '30%', 'display': 'inline-block', 'margin-left':'2.5%'})
+        ], className = 'row'),
+
+        html.Div([dcc.Graph(id = 'compare-plot')],
+                 className = 'row', style = {'margin-left': '2.5%', 'margin-right': '2.5%',
+                                             'padding-bottom' : '2%'}),
+
+        html.Div([html.H2("World Map")],
+                 style={'font-family':'Courier New, monospace',
+                        'text-align':'center',
+                        'color' : colors['figure_text']
+                       }, className = 'row'),
+
+        #The frames of a metric are fetched once, moving the slider or playing only runs assets/covid.js
+        dcc.Store(id = 'map-frames'),
+        dcc.Interval(id = 'map-timer', interval = map_step_ms, disabled = True),
+
+        html.Div([
+            dcc.Tabs(id = 'map-metric',
+                     value = 'total_cases',
+                     children = [dcc.Tab(label = map_metrics[metric][0], value = metric,
+                                         style = mapTabStyle, selected_style = mapTabSelectedStyle)
+                                 for metric in map_metrics]),
+            html.Div([
+                html.Div([html.Button('Play', id = 'map-play', n_clicks = 0)],
+                         style={'width': '8%', 'display': 'inline-block', 'vertical-align': 'top'}),
+                html.Div([dcc.Slider(
+                            id = 'map-date',
+                            min = 0,
+                            max = len(snap.daily.dates) - 1,
+                            step = 1,
+                            value = len(snap.daily.dates) - 1,
+                            marks = mapMarks(snap.daily.dates),
+                            updatemode = 'drag')],
+                         style={'width': '90%', 'display': 'inline-block'})
+            ], style = {'margin-top': '1%'}),
+            dcc.Graph(id = 'world-map')
+        ], className = 'row', style = {'margin-left': '2.5%', 'margin-right': '2.5%',
+                                       'padding-bottom' : '2%'})
+    ]
+
+layouts = {}
+
+def serveLayout():
+    #One layout per dataset version, built by the first page load after a swap
+    snap = dataset.current()
+    layout = layouts.get(snap.version)
+    if layout is None:
+        layout = buildLayout(snap)
+        layouts.clear()
+        layouts[snap.version] = layout
+    return layout
+
+app.layout = serveLayout
+
+@app.callback(
+    Output('country-section', 'children'),
+    [Input('url', 'pathname')])
+def loadCountrySection(pathname):
+    return countrySection(dataset.current())
+
+@app.callback(
+    [Output('countries', 'data'),
+     Output('countries', 'page_count'),
+     Output('countries', 'selected_rows')],
+    [Input('countries', 'page_current'),
+     Input('countries', 'page_size'),
+     Input('countries', 'sort_by'),
+     Input('countries', 'filter_query')],
+    [State('selected-country', 'data')])
+def updateTable(page_current, page_size, sort_by, filter_query, country):
+    snap = dataset.current()
+    with phase('slice'):
+        records, page_count = pageRecords(snap.x, snap.x_order, page_current or 0, page_size or table_page_size,
+                                          sort_by, filter_query)
+    #Keep the tick on the selected country when it is on this page
+    selected_rows = [i for i, record in enumerate(records) if record['id'] == country]
+    return records, page_count, selected_rows
+
+@app.callback(
+    Output('selected-country', 'data'),
+    [Input('countries', 'selected_row_ids')])
+def selectCountry(selected_row_ids):
+    if not selected_row_ids:
+        return dash.no_update
+    return selected_row_ids[0]
+
+def selectedCountry(snap, country):
+    if country is None or country not in snap.daily.country_cols:
+        return snap.x.loc[0].Country
+    return country
+
+def ordinal(day):
+    if 11 <= day % 100 <= 13:
+        return 'th'
+    return {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+
+def formatDate(date):
+    date = pd.Timestamp(date)
+    return "%d%s %s" % (date.day, ordinal(date.day), date.strftime("%B %Y"))
+
+def percentOf(part, total):
+    #Early dates have no cases yet, nothing grew then
+    return str(round(part/total*100, 3)) if total else '0'
+
+@app.callback(
+    [Output('as-of-header', component_property = 'children'),
+     Output('world_cases', component_property = 'children'),
+     Output('world_new_cases', component_property = 'children'),
+     Output('world_deaths', component_property = 'children'),
+     Output('world_new_deaths', component_property = 'children'),
+     Output('world_cases_per_million', component_property = 'children'),
+     Output('world_deaths_per_million', component_property = 'children')],
+    [Input('as-of-date', 'date')])
+def getWorldwideInfo(date):
+    snap = dataset.current()
+    daily = snap.daily
+    row = daily.row(date)
+    if row is None:
+        row = daily.row(snap.as_of)
+    population = snap.df_pop.population.sum()
+
+    total_cases = int(daily.world['total_cases'][row])
+    total_deaths = int(daily.world['total_deaths'][row])
+    new_cases = int(daily.world['new_cases'][row])
+    new_deaths = int(daily.world['new_deaths'][row])
+
+    obj1 = f"{total_cases:,d}"
+    obj2 = f"Increase in total cases in the past 24 Hrs : {new_cases:,d} "+"("+percentOf(new_cases, total_cases)+"%)"
+    obj3 = f"{total_deaths:,d}"
+    obj4 = f"Increase in total deaths in the past 24 Hrs : {new_deaths:,d} "+"("+percentOf(new_deaths, total_cases)+"%)"
+    obj5 = 'Total Cases Per Million : ' + "%8.2f"%(round((total_cases/population)*1000000,2))
+    obj6 = 'Total Deaths Per Million : ' + "%8.2f"%(round((total_deaths/population)*1000000,2))
+    return 'Showing data for ' + formatDate(daily.dates[row]), obj1, obj2, obj3, obj4, obj5, obj6
 
 @app.callback(
     [Output('country_cases', component_property = 'children'),
@@ -301,69 +654,253 @@ app.layout = html.Div(style={'backgroundColor': colors['background']}, children=
      Output('country_prev_day_deaths', component_property = 'children'),
      Output('country_per_million_deaths', component_property = 'children'),
      Output('countryHeader', component_property = 'children')],
-    [Input('countries', 'selected_rows')])
-def getGetCountrySpecificInfo(selected_country, death = False):
-    country = x.loc[0].Country
-    if selected_country is not None:
-        country = x.loc[selected_country[0]].Country
-    country_group = groups.get_group(country)
-
-    temp = x[x['Country'] == country]
-    prev_day = country_group[country_group['date'] == '11-02-2020']
-
-    obj1 = str(temp['Total Cases'].values[0])
-    obj2 = " +" + str(prev_day['new_cases'].values[0])
-    obj3 = "%8.2f"%(round((temp['Total Cases'].values[0]/country_group.population.values[0])*1000000,2))
-    obj4 = str(temp['Total Deaths'].values[0])
-    obj5 = " +" + str(prev_day['new_deaths'].values[0])
-    obj6 = "%8.2f"%(round((temp['Total Deaths'].values[0]/country_group.population.values[0])*1000000,2))
+    [Input('selected-country', 'data'),
+     Input('as-of-date', 'date')])
+def getGetCountrySpecificInfo(selected_country, date, death = False):
+    snap = dataset.current()
+    daily = snap.daily
+    country = selectedCountry(snap, selected_country)
+    population = snap.df_pop.population[country]
+    row = daily.row(date)
+    if row is None:
+        row = daily.row(snap.as_of)
+
+    #A country has nothing before its first report and no new cases on days it did not report
+    total_cases = np.nan_to_num(daily.value('total_cases', row, country))
+    total_deaths = np.nan_to_num(daily.value('total_deaths', row, country))
+
+    obj1 = str(total_cases)
+    obj2 = " +" + str(np.nan_to_num(daily.value('new_cases', row, country)))
+    obj3 = "%8.2f"%(round((total_cases/population)*1000000,2))
+    obj4 = str(total_deaths)
+    obj5 = " +" + str(np.nan_to_num(daily.value('new_deaths', row, country)))
+    obj6 = "%8.2f"%(round((total_deaths/population)*1000000,2))
     return obj1, obj2, obj3, obj4, obj5, obj6, str(country)
 
 @app.callback(
-    [Output('total-cases-country-plot','figure'),
-    Output('new-cases-country-plot','figure'),
-    Output('death-line-country-plot','figure')],
-    [Input('countries','selected_rows'),
-    Input('totalCases_radio', 'value'),
-    Input('newCases_radio', 'value'),
-    Input('totalDeaths_radio', 'value')])
-def plotCountrySpecificData(selected_rows, *values):
-    country = x.loc[0].Country
-    if selected_rows is not None:
-        country = x.loc[selected_rows[0]].Country
-    
-    temp = data[data['location'] == country]
-    selected_country = country
-    
-    plots = []
-    
-    for col, color, value in zip(['total_cases','new_cases','total_deaths'],['#3CA4FF','#1736e3','#BB2205'], values):
-        if value == "bar":
-            pxfig = px.bar(temp, x='date', y=col, color_discrete_sequence = [color])
+    Output('daily-count', 'figure'),
+    [Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('viewport', 'data')])
+def plotMainData(start_date, end_date, viewport):
+    snap = dataset.current()
+    return cachedMainPlot(snap, *rangeKeys(snap, start_date, end_date), pointBudget(viewport, main_plot_width))
+
+def cachedMainPlot(snap, start_date, end_date, budget):
+    return figure_cache.get(snap.version, ('main', start_date, end_date, budget),
+                            lambda: getMainPlot(snap, start_date, end_date, budget))
+
+def buildCountryFigure(snap, country, col, color, start_date = None, end_date = None, budget = 600):
+    with phase('slice'):
+        if col in snap.series.columns:
+            temp = snap.series.country(country, [col], start_date, end_date)
         else:
-            pxfig = px.line(temp, x='date', y=col, color_discrete_sequence = [color])
-            pxfig.update_traces(mode='markers+lines')
-        pxfig.update_traces(hovertemplate = None)
-        pxfig.update_xaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
-        pxfig.update_yaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
-        pxfig.update_layout(hovermode="x", 
-                            xaxis_title = None,
-                            yaxis_title = None,
-                            title={'text': col.replace("_"," ").upper(),
-                                   'y':0.9,
-                                   'x':0.5,
-                                   'xanchor': 'center',
-                                   'yanchor': 'top'},
-                           font=dict(family="Courier New, monospace",
-                                     size=14,
-                                     color=colors['figure_text']),
-                           paper_bgcolor=colors['background'],
-                           plot_bgcolor=colors['background'],
-                           margin=dict(l=0, r=0, t=0, b=0))
-        plots.append(pxfig)
-    
-    return plots[0], plots[1], plots[2]
+            #Derived metrics only live in the daily table
+            dates, values = snap.daily.gather(col, [country], start_date, end_date)
+            temp = pd.DataFrame({'date': dates, col: values[:, 0]})
+        temp = downsample(temp, col, budget)
+    with phase('figure'):
+        return countryFigure(temp, col, color)
+
+def countryFigure(temp, col, color):
+    key = ('country', col, color, len(temp) > webgl_rows)
+    if key not in frozen_figures:
+        fig = pxCountryFigure(temp, col, color)
+        frozen_figures[key] = FrozenFigure(fig)
+        return fig
+    return frozen_figures[key].fill([{'x': temp['date'].to_numpy(), 'y': temp[col].to_numpy()}])
+
+def pxCountryFigure(temp, col, color):
+    import plotly.express as px
+    pxfig = px.line(temp, x='date', y=col, color_discrete_sequence = [color])
+    pxfig.update_traces(mode='markers+lines')
+    pxfig.update_traces(hovertemplate = None)
+    pxfig.update_xaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
+    pxfig.update_yaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
+    pxfig.update_layout(hovermode="x", 
+                        xaxis_title = None,
+                        yaxis_title = None,
+                        title={'text': metricLabel(col).upper(),
+                               'y':0.9,
+                               'x':0.5,
+                               'xanchor': 'center',
+                               'yanchor': 'top'},
+                       font=dict(family="Courier New, monospace",
+                                 size=14,
+                                 color=colors['figure_text']),
+                       paper_bgcolor=colors['background'],
+                       plot_bgcolor=colors['background'],
+                       margin=dict(l=0, r=0, t=0, b=0))
+    return pxfig
+
+#The server only ships the line figure of a country plot, line/bar is switched in assets/covid.js.
+#Every plot has its own store and callback, so switching one metric sends only that figure.
+def countryFigureCallback(col, color):
+    def plotCountrySpecificData(selected_country, start_date = None, end_date = None, viewport = None, metric = None):
+        snap = dataset.current()
+        country = selectedCountry(snap, selected_country)
+        return cachedCountryFigure(snap, country, col, color, metric, *rangeKeys(snap, start_date, end_date),
+                                   pointBudget(viewport, country_plot_width))
+    return plotCountrySpecificData
+
+def cachedCountryFigure(snap, country, col, color, metric, start_date, end_date, budget):
+    metric = metric if metric in country_metrics[col] else col
+    return figure_cache.get(snap.version, (country, metric, start_date, end_date, budget),
+                            lambda: buildCountryFigure(snap, country, metric, color, start_date, end_date, budget))
+
+def cachedCountryFigures(snap, country, start_date, end_date, budget):
+    #Figures of every country plot on its default metric, what a first visit asks for
+    return {graph: cachedCountryFigure(snap, country, col, color, None, start_date, end_date, budget)
+            for graph, radio, dropdown, col, color in country_plots}
+
+for graph, radio, dropdown, col, color in country_plots:
+    app.callback(
+        Output(graph + '-figure', 'data'),
+        [Input('selected-country', 'data'),
+         Input('date-range', 'start_date'),
+         Input('date-range', 'end_date'),
+         Input('viewport', 'data'),
+         Input(dropdown, 'value')])(countryFigureCallback(col, color))
+
+    app.clientside_callback(
+        ClientsideFunction(namespace = 'covid', function_name = 'setTraceType'),
+        Output(graph, 'figure'),
+        [Input(graph + '-figure', 'data'),
+         Input(radio, 'value')])
+
+app.clientside_callback(
+    ClientsideFunction(namespace = 'covid', function_name = 'viewportWidth'),
+    Output('viewport', 'data'),
+    [Input('url', 'pathname')])
+
+@app.callback(
+    Output('compare-plot', 'figure'),
+    [Input('compare-countries', 'value'),
+     Input('compare-metrics', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('viewport', 'data')])
+def plotComparison(countries, metric_choices, start_date, end_date, viewport):
+    snap = dataset.current()
+    countries = [country for country in countries or [] if country in snap.daily.country_cols]
+    metric_choices = [metric for metric in metric_choices or [] if metric in compareMetrics(snap)]
+    budget = pointBudget(viewport, compare_plot_width)
+    with phase('slice'):
+        #One column gather per metric, adding a country only widens the gather
+        series = {}
+        for metric in metric_choices:
+            name = metric[:-len('_per_million')] if metric.endswith('_per_million') else metric
+            dates, values = snap.daily.gather(name, countries, dateKey(start_date), dateKey(end_date))
+            if name != metric:
+                values = values / snap.df_pop.population.reindex(countries).to_numpy(dtype = float) * 1e6
+            series[metric] = (dates, values)
+    with phase('figure'):
+        return comparisonFigure(countries, metric_choices, series, budget)
+
+def comparisonFigure(countries, metric_choices, series, budget):
+    fig = make_subplots(rows = max(1, len(metric_choices)), cols = 1, shared_xaxes = True, vertical_spacing = 0.05,
+                        subplot_titles = [metricLabel(metric) for metric in metric_choices])
+    palette = qualitative.Plotly
+    for row, metric in enumerate(metric_choices, 1):
+        dates, values = series[metric]
+        days = dates.view('i8')
+        for i, country in enumerate(countries):
+            y = values[:, i]
+            finite = np.flatnonzero(np.isfinite(y))
+            keep = finite[lttb(days[finite], y[finite], budget)]
+            fig.add_trace(go.Scatter(x = dates[keep], y = y[keep], name = country, mode = 'lines',
+                                     legendgroup = country, showlegend = row == 1,
+                                     line = dict(color = palette[i % len(palette)])),
+                          row = row, col = 1)
+    fig.update_xaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
+    fig.update_yaxes(showgrid=True, gridwidth=2, gridcolor=colors['gridcolor'])
+    fig.update_layout(hovermode="x",
+                      height=max(1, len(metric_choices)) * 350,
+                      font=dict(family="Courier New, monospace",
+                                size=14,
+                                color=colors['figure_text']),
+                      paper_bgcolor=colors['background'],
+                      plot_bgcolor=colors['background'],
+                      margin=dict(l=0, r=0, t=30, b=0))
+    return fig
+
+@app.callback(
+    Output('map-frames', 'data'),
+    [Input('map-metric', 'value')])
+def loadMapFrames(metric):
+    snap = dataset.current()
+    metric = metric if metric in map_metrics else 'total_cases'
+    return figure_cache.get(snap.version, ('map', metric), lambda: mapFrames(snap, metric))
+
+def mapFrames(snap, metric):
+    #Every date of the metric per million, from the daily table instead of a query per date
+    daily = snap.daily
+    with phase('slice'):
+        population = snap.df_pop.population.reindex(daily.countries).to_numpy(dtype = float)
+        frames = encodeFrames(daily.dates, daily.values[metric] / population * 1e6)
+    label, colorscale = map_metrics[metric]
+    frames.update({'locations': daily.iso_codes, 'names': list(daily.countries),
+                   'title': label.upper(), 'colorscale': colorscale})
+    return frames
+
+app.clientside_callback(
+    ClientsideFunction(namespace = 'covid', function_name = 'mapFigure'),
+    Output('world-map', 'figure'),
+    [Input('map-frames', 'data'),
+     Input('map-date', 'value')])
+
+app.clientside_callback(
+    ClientsideFunction(namespace = 'covid', function_name = 'toggleMapPlay'),
+    [Output('map-timer', 'disabled'),
+     Output('map-play', 'children')],
+    [Input('map-play', 'n_clicks')])
+
+app.clientside_callback(
+    ClientsideFunction(namespace = 'covid', function_name = 'stepMap'),
+    Output('map-date', 'value'),
+    [Input('map-timer', 'n_intervals')],
+    [State('map-date', 'value'),
+     State('map-date', 'max')])
+
+#WARMUP_COUNTRIES builds the figures of that many top countries ('all' for every one) on
+#WARMUP_THREADS background threads once the data is loaded, and again after every reload
+warmup_countries = os.environ.get('WARMUP_COUNTRIES', '0')
+warm_up = WarmUp(threads = int(os.environ.get('WARMUP_THREADS', 2)))
+metrics.registry.gauge('dash_warmup', lambda: {(('stat', k),): v for k, v in warm_up.stats().items()})
+
+def warmUp(snap):
+    #Same cache keys as a first visit: the whole date range in a WARMUP_VIEWPORT pixel wide window
+    viewport = int(os.environ.get('WARMUP_VIEWPORT', 1920))
+    start_date, end_date = rangeKeys(snap, snap.daily.dates[0], snap.as_of)
+    countries = snap.x.Country if warmup_countries == 'all' else snap.x.Country[:int(warmup_countries)]
+    tasks = [lambda: cachedMainPlot(snap, start_date, end_date, pointBudget(viewport, main_plot_width))]
+    tasks += [lambda country = country: cachedCountryFigures(snap, country, start_date, end_date,
+                                                             pointBudget(viewport, country_plot_width))
+              for country in countries]
+    if len(countries) * len(country_plots) + 1 > figure_cache.max_entries:
+        logging.getLogger(__name__).warning("warm-up builds more figures than FIGURE_CACHE_ENTRIES=%d keeps",
+                                            figure_cache.max_entries)
+    warm_up.start(snap.version[:12], tasks)
+
+def startWarmUp():
+    #Not started on import, under gunicorn every worker starts its own after the fork
+    if warmup_countries != '0':
+        snap = dataset.current()
+        dataset.onSwap(warmUp)
+        warmUp(snap)
 
+def prepare():
+    #Loads data.csv, builds the layout and the map frames and imports plotly.express ahead of the first visitor
+    serveLayout()
+    for metric in map_metrics:
+        loadMapFrames(metric)
+    import plotly.express
 
 if __name__ == '__main__':
+    def background():
+        prepare()
+        startWarmUp()
+    threading.Thread(target = background, name = 'prepare', daemon = True).start()
+    if reload_interval:
+        dataset.watch(reload_interval)
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,84 @@
+//Map values of the date last drawn, moving forward only replays the changes after it
+var covidMap = {frames: null, index: 0, z: null};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    covid: {
+        //Lets the server size downsampled figures to the browser window
+        viewportWidth: function(pathname) {
+            return window.innerWidth;
+        },
+
+        //Turns the line figure shipped by the server into the plot picked on the radio
+        setTraceType: function(figure, kind) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            if (kind !== 'bar') {
+                return figure;
+            }
+            var traces = figure.data.map(function(trace) {
+                var bar = Object.assign({}, trace, {type: 'bar',
+                                                    marker: {color: trace.line.color},
+                                                    textposition: 'auto'});
+                delete bar.mode;
+                delete bar.line;
+                return bar;
+            });
+            return {data: traces,
+                    layout: Object.assign({}, figure.layout, {barmode: 'relative'})};
+        },
+
+        //Choropleth of the date at index, from the frames encoded by mapframes.encodeFrames
+        mapFigure: function(frames, index) {
+            if (!frames) {
+                return window.dash_clientside.no_update;
+            }
+            var last = frames.dates.length - 1;
+            index = index == null ? last : Math.max(0, Math.min(index, last));
+            if (covidMap.frames !== frames || index < covidMap.index) {
+                covidMap.frames = frames;
+                covidMap.index = 0;
+                covidMap.z = frames.first.slice();
+            }
+            for (; covidMap.index < index; covidMap.index++) {
+                var change = frames.changes[covidMap.index];
+                if (change[0] === null) {
+                    covidMap.z = change[1].slice();
+                    continue;
+                }
+                for (var i = 0; i < change[0].length; i++) {
+                    covidMap.z[change[0][i]] = change[1][i];
+                }
+            }
+            return {data: [{type: 'choropleth',
+                            locations: frames.locations,
+                            locationmode: 'ISO-3',
+                            z: covidMap.z.slice(),
+                            text: frames.names,
+                            hoverinfo: 'text+z',
+                            zmin: 0,
+                            zmax: frames.zmax,
+                            colorscale: frames.colorscale,
+                            marker: {line: {color: '#545454', width: 0.5}},
+                            colorbar: {thickness: 12}}],
+                    layout: {title: {text: frames.title + ' : ' + frames.dates[index], x: 0.5},
+                             font: {family: 'Courier New, monospace', size: 14, color: '#ffffff'},
+                             geo: {showframe: false, showcoastlines: false, projection: {type: 'natural earth'},
+                                   bgcolor: '#2D2D2D', landcolor: '#393939', showland: true},
+                             paper_bgcolor: '#2D2D2D',
+                             height: 550,
+                             uirevision: 'map',
+                             margin: {l: 0, r: 0, t: 40, b: 0}}};
+        },
+
+        toggleMapPlay: function(n_clicks) {
+            var playing = n_clicks % 2 === 1;
+            return [!playing, playing ? 'Pause' : 'Play'];
+        },
+
+        //Next date on every tick of the map timer, starting over after the last one
+        stepMap: function(n_intervals, value, max) {
+            return value >= max ? 0 : value + 1;
+        }
+    }
+});
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+#Runs in a fresh interpreter inside the work directory, so import costs are really paid
+startup_script = """
+import json, time
+t0 = time.perf_counter()
+import loader
+t1 = time.perf_counter()
+loader.loadData('data.csv')
+t2 = time.perf_counter()
+import app
+t3 = time.perf_counter()
+print(json.dumps({'import_loader': t1 - t0, 'load_data': t2 - t1, 'import_app': t3 - t2}))
+"""
+
+def summarize(times, sizes = None):
+    times = np.asarray(times) * 1000
+    result = {'n': len(times),
+              'mean_ms': float(times.mean()),
+              'p50_ms': float(np.percentile(times, 50)),
+              'p95_ms': float(np.percentile(times, 95)),
+              'max_ms': float(times.max())}
+    if sizes:
+        result['bytes_mean'] = float(np.mean(sizes))
+        result['bytes_max'] = int(max(sizes))
+    return result
+
+def timeStartup(workdir, repeat):
+    env = dict(os.environ, PYTHONPATH = here, DATA_RELOAD_INTERVAL = '0')
+    results = {}
+    for label, cold in [('cold', True), ('warm', False)]:
+        runs = []
+        for _ in range(repeat):
+            if cold and os.path.exists(os.path.join(workdir, 'data.csv.feather')):
+                os.remove(os.path.join(workdir, 'data.csv.feather'))
+            out = subprocess.run([sys.executable, '-c', startup_script], cwd = workdir, env = env,
+                                 capture_output = True, text = True, check = True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        for phase in runs[0]:
+            results['startup_%s_%s' % (label, phase)] = summarize([run[phase] for run in runs])
+    return results
+
+def timeCsvReaders(path, repeat):
+    #Cold parse of the CSV alone, pandas.read_csv against the pyarrow reader loadData uses
+    import loader
+    results = {}
+    for label, read in [('pandas', loader.readCsv), ('arrow', loader.readArrowCsv)]:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            read(path)
+            times.append(time.perf_counter() - start)
+        results['csv_%s' % label] = summarize(times)
+    #pyarrow rounds every float correctly, pandas' default parser can be a last bit off
+    try:
+        pd.testing.assert_frame_equal(loader.readCsv(path), loader.readArrowCsv(path), check_exact = False)
+        results['csv_arrow']['same_as_pandas'] = True
+    except AssertionError:
+        results['csv_arrow']['same_as_pandas'] = False
+    return results
+
+def callbackBody(outputs, inputs, state = ()):
+    #The JSON the dash renderer posts to /_dash-update-component
+    def spec(prop, value):
+        component, name = prop.rsplit('.', 1)
+        return {'id': component, 'property': name, 'value': value}
+    specs = [dict(zip(['id', 'property'], output.rsplit('.', 1))) for output in outputs]
+    return {'output': '..' + '...'.join(outputs) + '..' if len(outputs) > 1 else outputs[0],
+            'outputs': specs if len(outputs) > 1 else specs[0],
+            'inputs': [spec(prop, value) for prop, value in inputs],
+            'state': [spec(prop, value) for prop, value in state],
+            'changedPropIds': [inputs[0][0]]}
+
+def timeCallback(client, body):
+    start = time.perf_counter()
+    response = client.post('/_dash-update-component', json = body)
+    elapsed = time.perf_counter() - start
+    if response.status_code not in (200, 204):
+        raise RuntimeError("%s returned %d" % (body['output'], response.status_code))
+    return elapsed, len(response.data)
+
+def timeCallbacks(app, repeat):
+    client = app.app.server.test_client()
+    snap = app.dataset.current()
+    countries = list(snap.x.Country)
+    as_of = snap.as_of.date().isoformat()
+    results = {}
+
+    def run(name, bodies, cold = False):
+        if not cold:
+            for body in bodies:
+                timeCallback(client, body)
+        times, sizes = [], []
+        for _ in range(repeat):
+            for body in bodies:
+                if cold:
+                    app.figure_cache.clear()
+                    app.response_cache.clear()
+                elapsed, size = timeCallback(client, body)
+                times.append(elapsed)
+                sizes.append(size)
+        results[name] = summarize(times, sizes)
+
+    layout_times, layout_sizes = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        layout = client.get('/_dash-layout').data
+        layout_times.append(time.perf_counter() - start)
+        layout_sizes.append(len(layout))
+    results['layout'] = summarize(layout_times, layout_sizes)
+
+    main = [callbackBody(['daily-count.figure'],
+                         [('date-range.start_date', None), ('date-range.end_date', None), ('viewport.data', 1920)])]
+    run('getMainPlot_cold', main, cold = True)
+    run('getMainPlot_warm', main)
+
+    world = [callbackBody(['as-of-header.children', 'world_cases.children', 'world_new_cases.children',
+                           'world_deaths.children', 'world_new_deaths.children',
+                           'world_cases_per_million.children', 'world_deaths_per_million.children'],
+                          [('as-of-date.date', as_of)])]
+    run('getWorldwideInfo', world)
+
+    info = [callbackBody(['country_cases.children', 'country_prev_day_cases.children',
+                          'country_per_million_cases.children', 'country_deaths.children',
+                          'country_prev_day_deaths.children', 'country_per_million_deaths.children',
+                          'countryHeader.children'],
+                         [('selected-country.data', country), ('as-of-date.date', as_of)])
+            for country in countries]
+    run('getGetCountrySpecificInfo', info)
+
+    #Line/bar radios are switched in the browser, a country change posts one callback per country plot
+    plots = [callbackBody([graph + '-figure.data'],
+                          [('selected-country.data', country), ('date-range.start_date', None),
+                           ('date-range.end_date', None), ('viewport.data', 1920), (dropdown + '.value', col)])
+             for country in countries for graph, radio, dropdown, col, color in app.country_plots]
+    run('plotCountrySpecificData_cold', plots, cold = True)
+    run('plotCountrySpecificData_warm', plots)
+
+    table = [callbackBody(['countries.data', 'countries.page_count', 'countries.selected_rows'],
+                          [('countries.page_current', page), ('countries.page_size', 15),
+                           ('countries.sort_by', [{'column_id': 'Total Deaths', 'direction': 'desc'}]),
+                           ('countries.filter_query', '')],
+                          [('selected-country.data', None)])
+             for page in range(0, len(countries) // 15 + 1)]
+    run('updateTable', table)
+    results['figure_cache'] = app.figure_cache.stats()
+    results['response_cache'] = app.response_cache.stats()
+    return results
+
+def timeFigures(app, repeat):
+    #Figure building alone, plotly.express against the frozen figures, on the same downsampled frames
+    from figures import toJson
+    snap = app.dataset.current()
+    frames = [(app.downsample(snap.series.country(country, [col]), col, 500), col, color)
+              for country in snap.x.Country for graph, radio, dropdown, col, color in app.country_plots]
+    main = app.pd.concat([app.downsample(snap.series.country(country, ['total_cases']), 'total_cases', 1200)
+                          for country in sorted(snap.top_ten.Country)])
+    builders = {'country': (app.pxCountryFigure, app.countryFigure, frames),
+                'main': (app.pxMainFigure, app.mainFigure, [(main,)])}
+    results = {}
+    for name, (px_build, frozen_build, inputs) in builders.items():
+        frozen_build(*inputs[0])
+        identical = True
+        for label, build in [('px', px_build), ('frozen', frozen_build)]:
+            times = []
+            for _ in range(repeat):
+                for args in inputs:
+                    start = time.perf_counter()
+                    toJson(build(*args))
+                    times.append(time.perf_counter() - start)
+            results['figure_%s_%s' % (name, label)] = summarize(times)
+        for args in inputs:
+            identical = identical and toJson(px_build(*args)) == toJson(frozen_build(*args))
+        results['figure_%s_frozen' % name]['identical_to_px'] = identical
+    return results
+
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = here, capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print("%-36s %12s %12s %8s" % ("benchmark", "before ms", "after ms", "ratio"))
+    for name, result in results.items():
+        if 'mean_ms' in result and 'mean_ms' in baseline.get(name, {}):
+            before = baseline[name]['mean_ms']
+            print("%-36s %12.2f %12.2f %8.2f" % (name, before, result['mean_ms'], result['mean_ms'] / before))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Time startup and callbacks of the dashboard on synthetic data')
+    parser.add_argument('--countries', type = int, default = 200)
+    parser.add_argument('--days', type = int, default = 300)
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', default = 'benchmark.json')
+    parser.add_argument('--compare', help = 'earlier output to print ratios against')
+    parser.add_argument('--csv-countries', type = int, default = 0,
+                        help = 'time the CSV readers on a separate file this many countries wide')
+    parser.add_argument('--csv-days', type = int, default = 1000)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rows = synthetic.generate(os.path.join(workdir, 'data.csv'), args.countries, args.days, seed = args.seed)
+        results = timeStartup(workdir, args.repeat)
+        csv_path, csv_rows = os.path.join(workdir, 'data.csv'), rows
+        if args.csv_countries:
+            csv_path = os.path.join(workdir, 'large.csv')
+            csv_rows = synthetic.generate(csv_path, args.csv_countries, args.csv_days, seed = args.seed)
+        results.update(timeCsvReaders(csv_path, args.repeat))
+
+        os.chdir(workdir)
+        os.environ['DATA_RELOAD_INTERVAL'] = '0'
+        import app
+        results.update(timeCallbacks(app, args.repeat))
+        results.update(timeFigures(app, args.repeat))
+
+    report = {'commit': gitCommit(),
+              'python': platform.python_version(),
+              'machine': platform.machine(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'params': {'countries': args.countries, 'days': args.days, 'rows': rows,
+                         'repeat': args.repeat, 'seed': args.seed, 'csv_rows': csv_rows},
+              'results': results}
+    with open(output, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print("wrote %s" % output)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import numpy as np
+
+def lttb(x, y, threshold):
+    #Indices of the points kept by Largest-Triangle-Three-Buckets, first and last point always stay
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+
+    #threshold - 2 buckets over the inner points, each keeps the point spanning the largest
+    #triangle with the previously kept point and the average of the next bucket
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.r_[edges, n]
+    keep = np.empty(threshold, dtype = int)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = x[stop:edges[i + 2]].mean()
+        next_y = y[stop:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) -
+                      (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def downsample(frame, col, budget):
+    #Rows of frame left after dropping missing values of col and capping it at budget points
+    values = frame[col].to_numpy(dtype = float)
+    finite = np.flatnonzero(np.isfinite(values))
+    dates = frame['date'].to_numpy().astype('datetime64[ns]').view('i8')[finite]
+    return frame.iloc[finite[lttb(dates, values[finite], budget)]]
@@ -0,0 +1,95 @@
+import json
+import threading
+from collections import OrderedDict
+
+from figures import toJson
+
+class FigureCache:
+    #LRU of serialized figures, bounded by entry count and total JSON size. Misses fall through
+    #to store, when given, a cache shared with other processes (see sharedcache.SqliteStore).
+    def __init__(self, max_entries = 256, max_bytes = 64 * 1024 * 1024, store = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+    def reset(self, version):
+        #Entries only hold for the dataset version they were built from
+        with self.lock:
+            if version == self.version:
+                return
+            self.entries.clear()
+            self.nbytes = 0
+            self.version = version
+        if self.store is not None:
+            self.store.reset(version)
+
+    def rebase(self, version, keep):
+        #Moves the entries whose key passes keep() over to version and drops the rest
+        with self.lock:
+            entries = OrderedDict(((version, key), figure_json) for (entry_version, key), figure_json
+                                  in self.entries.items() if entry_version == self.version and keep(key))
+            self.entries = entries
+            self.nbytes = sum(len(figure_json) for figure_json in entries.values())
+            old_version, self.version = self.version, version
+        if self.store is not None and old_version is None:
+            self.store.reset(version)
+        elif self.store is not None:
+            self.store.rebase(old_version, version, keep)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+        if self.store is not None:
+            self.store.clear()
+
+    def get(self, version, key, build):
+        #Entries of an older version are unreachable, so callbacks still running
+        #against a previous snapshot never mix in figures of the new one
+        key = (version, key)
+        with self.lock:
+            figure_json = self.entries.get(key)
+            if figure_json is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(figure_json)
+            self.misses += 1
+
+        figure_json = self.store.get(*key) if self.store is not None else None
+        if figure_json is not None:
+            with self.lock:
+                self.shared_hits += 1
+        else:
+            figure_json = toJson(build())
+            if self.store is not None and key[0] == self.version:
+                self.store.put(key[0], key[1], figure_json)
+        self.put(key, figure_json)
+        return json.loads(figure_json)
+
+    def put(self, key, figure_json):
+        size = len(figure_json)
+        with self.lock:
+            if key[0] != self.version or size > self.max_bytes:
+                return
+            if key in self.entries:
+                self.nbytes -= len(self.entries.pop(key))
+            self.entries[key] = figure_json
+            self.nbytes += size
+            while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last = False)
+                self.nbytes -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            stats = {'entries': len(self.entries), 'bytes': self.nbytes,
+                     'hits': self.hits, 'shared_hits': self.shared_hits, 'misses': self.misses}
+        if self.store is not None:
+            stats.update(self.store.stats())
+        return stats
@@ -0,0 +1,30 @@
+import plotly.io
+
+try:
+    #What Figure.to_dict() applies to numeric arrays since plotly 6
+    from _plotly_utils.utils import convert_to_base64
+except ImportError:
+    def convert_to_base64(obj):
+        pass
+
+#plotly.express switches line traces to scattergl above this many rows
+webgl_rows = 1000
+
+def toJson(figure):
+    #Same JSON as figure.to_json() for a plotly Figure, and for the dicts FrozenFigure.fill builds
+    return plotly.io.to_json(figure, validate = False)
+
+class FrozenFigure:
+    #Figure of a plotly.express builder taken apart once, later figures of the same kind only get
+    #their trace data (x, y, names) swapped in. Whatever else px derives from the data, like the
+    #number of traces or webgl above webgl_rows rows, has to be part of the key it is kept under.
+    def __init__(self, figure):
+        figure = figure.to_dict()
+        self.traces = figure['data']
+        self.layout = figure['layout']
+
+    def fill(self, traces):
+        #traces holds the changing properties of every trace, they keep their position in the trace
+        data = [dict(template, **trace) for template, trace in zip(self.traces, traces)]
+        convert_to_base64(data)
+        return {'data': data, 'layout': self.layout}
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'wsgi:server'
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+#Workers share the figures they draw through this file unless FIGURE_CACHE_PATH says otherwise
+os.environ.setdefault('FIGURE_CACHE_PATH', os.path.join(chdir, 'figures.sqlite'))
+
+#Load data.csv once in the master, the workers read the same memory-mapped pages after the fork
+preload_app = True
+
+def post_fork(server, worker):
+    #Threads do not survive a fork, each worker starts its own data.csv watcher. When the file changes
+    #one worker parses it under loader.CacheLock, the others wait and map the cache it writes.
+    from app import dataset, reload_interval, startWarmUp
+    if reload_interval:
+        dataset.watch(reload_interval)
+    startWarmUp()
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#Bodies shorter than this go out as they are, compressing them saves next to nothing
+min_compress_bytes = 1024
+
+#Content encodings offered, in order of preference when the client takes several
+encoders = OrderedDict()
+if brotli is not None:
+    encoders['br'] = lambda body: brotli.compress(body, quality = 5)
+encoders['gzip'] = lambda body: gzip.compress(body, compresslevel = 6)
+
+class ResponseCache:
+    #LRU of callback and layout response bodies by ETag, together with their compressed variants
+    def __init__(self, max_bytes = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+    def reset(self, version):
+        #Tags already carry the version, this only frees the entries of older ones
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.nbytes = 0
+                self.version = version
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def get(self, tag):
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(tag)
+            self.hits += 1
+            return entry['mimetype'], entry['identity']
+
+    def put(self, version, tag, mimetype, body):
+        with self.lock:
+            if version != self.version or len(body) > self.max_bytes or tag in self.entries:
+                return
+            self.entries[tag] = {'mimetype': mimetype, 'identity': body}
+            self.nbytes += len(body)
+            self.evict()
+
+    def variant(self, tag, encoding, body):
+        #body compressed with encoding, compressed once per cached entry
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is not None and encoding in entry:
+                return entry[encoding]
+        encoded = encoders[encoding](body)
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is not None and encoding not in entry:
+                entry[encoding] = encoded
+                self.nbytes += len(encoded)
+                self.evict()
+        return encoded
+
+    def evict(self):
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last = False)
+            self.nbytes -= sum(len(body) for name, body in evicted.items() if name != 'mimetype')
+
+    def notModified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.nbytes, 'hits': self.hits,
+                    'misses': self.misses, 'not_modified': self.not_modified}
+
+def requestKey():
+    #What besides the dataset version a response depends on, None for responses left alone
+    request = flask.request
+    if request.method == 'POST' and request.path.endswith('/_dash-update-component'):
+        return request.get_data()
+    if request.method == 'GET' and request.path.endswith('/_dash-layout'):
+        return b'layout'
+    return None
+
+def install(app, version, cache):
+    #Tags callback and layout responses of app with ETags of version() and the request body,
+    #answers conditional and repeated requests from cache and compresses what goes out
+    server = app.server
+
+    @server.before_request
+    def answerFromCache():
+        key = requestKey()
+        if key is None:
+            return None
+        flask.g.response_version = current = version()
+        flask.g.response_tag = tag = hashlib.sha1(current.encode() + b'\0' + key).hexdigest()
+        if tag in flask.request.if_none_match:
+            cache.notModified()
+            response = flask.Response(status = 304)
+        else:
+            cached = cache.get(tag)
+            if cached is None:
+                return None
+            mimetype, body = cached
+            response = flask.Response(body, mimetype = mimetype)
+        response.headers['X-Cache'] = 'hit'
+        return response
+
+    @server.after_request
+    def encodeResponse(response):
+        tag = flask.g.pop('response_tag', None)
+        if tag is None or response.status_code not in (200, 304) or response.is_streamed:
+            return response
+        response.set_etag(tag)
+        #Browsers keep the layout but check back with the tag on every page load
+        response.headers['Cache-Control'] = 'no-cache'
+        if response.status_code == 304:
+            return response
+
+        body = response.get_data()
+        if response.headers.get('X-Cache') != 'hit' and flask.g.response_version == version():
+            cache.put(flask.g.response_version, tag, response.mimetype, body)
+        response.vary.add('Accept-Encoding')
+        encoding = flask.request.accept_encodings.best_match(list(encoders))
+        if encoding and len(body) >= min_compress_bytes and 'Content-Encoding' not in response.headers:
+            response.set_data(cache.variant(tag, encoding, body))
+            response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,69 @@
+import argparse
+import collections
+import json
+import os
+import re
+import subprocess
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+line_format = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+def importTimes(module = 'app'):
+    #(self us, cumulative us, depth, name) of every module `import module` loads, from python -X importtime
+    env = dict(os.environ, PYTHONPATH = here, DATA_RELOAD_INTERVAL = '0')
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd = here, env = env,
+                            capture_output = True, text = True, check = True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = line_format.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((int(own), int(cumulative), (len(indent) - 1) // 2, name))
+    return rows
+
+def summarize(rows, module):
+    #Milliseconds of the whole import, of every top level package and of the slowest modules
+    packages = collections.Counter()
+    for own, cumulative, depth, name in rows:
+        packages[name.split('.')[0]] += own / 1000
+    total = sum(own for own, cumulative, depth, name in rows) / 1000
+    return {'module': module,
+            'total_ms': total,
+            'module_ms': next((cumulative / 1000 for own, cumulative, depth, name in rows if name == module), total),
+            'packages_ms': dict(packages.most_common()),
+            'modules_ms': {name: own / 1000 for own, cumulative, depth, name in sorted(rows, reverse = True)[:50]}}
+
+def printReport(report, limit, baseline = None):
+    before = baseline or {}
+    print("import %s: %.1f ms (%.1f ms for everything the interpreter loads)"
+          % (report['module'], report['module_ms'], report['total_ms']))
+    for title, key in [("top level package", 'packages_ms'), ("module (self time)", 'modules_ms')]:
+        print("\n%-40s %10s %10s" % (title, "ms", "before" if baseline else ""))
+        for name, ms in list(report[key].items())[:limit]:
+            previous = before.get(key, {}).get(name)
+            print("%-40s %10.1f %10s" % (name, ms, "" if previous is None else "%.1f" % previous))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Report where the time of importing the dashboard goes')
+    parser.add_argument('module', nargs = '?', default = 'app')
+    parser.add_argument('--limit', type = int, default = 15)
+    parser.add_argument('--repeat', type = int, default = 3, help = 'keep the fastest of this many imports')
+    parser.add_argument('--output', help = 'write the report as JSON')
+    parser.add_argument('--compare', help = 'earlier --output to show next to this one')
+    args = parser.parse_args()
+
+    reports = [summarize(importTimes(args.module), args.module) for _ in range(args.repeat)]
+    report = min(reports, key = lambda report: report['module_ms'])
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    printReport(report, args.limit, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2)
+
+if __name__ == '__main__':
+    main()
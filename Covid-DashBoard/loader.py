@@ -0,0 +1,589 @@
+import csv
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from series import PandasSeries, SqliteSeries, removeSeries, seriesPath, seriesVersions
+from tablequery import sortOrders
+
+log = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#Columns picked out of the OWID covid export
+usecols = [0,1,2,3,4,5,7,8,10,11,13,14,34,35,47]
+
+#Columns of usecols read as text, the date is parsed and every other one is a float
+text_columns = ['iso_code', 'continent', 'location']
+
+#Bumped whenever readCsv changes what ends up in the cached frame
+cache_format = '5'
+
+def readCsv(path):
+    data = pd.read_csv(path, parse_dates=['date'], usecols = usecols)
+    data.drop(data[data['continent'].isnull()].index, inplace = True)
+    data.drop(data[(data['new_cases'].isnull()) & (data['total_cases'].isnull())].index, inplace = True)
+    return cleanFrame(data)
+
+def readArrowCsv(path):
+    #Same frame as readCsv from pyarrow's multithreaded reader. Only the usecols columns are converted
+    #and the aggregate and empty rows are filtered out of every block as it is parsed, so they never
+    #reach the table. Types are fixed up front, a block must not infer int where a later one has floats.
+    with open(path, newline = '') as f:
+        names = next(csv.reader(f))
+    columns = [names[i] for i in usecols]
+    types = {col: pa.string() if col in text_columns else pa.timestamp('us') if col == 'date' else pa.float64()
+             for col in columns}
+    source = pads.dataset(path, format = pads.CsvFileFormat(
+        convert_options = pacsv.ConvertOptions(column_types = types, strings_can_be_null = True)))
+    keep = pads.field('continent').is_valid() & (pads.field('new_cases').is_valid() | pads.field('total_cases').is_valid())
+    table = source.to_table(columns = columns, filter = keep, use_threads = True)
+    return cleanFrame(table.to_pandas())
+
+def cleanFrame(data):
+    #Rows of a country are contiguous and in date order, see CountryIndex
+    data.sort_values(['location', 'date'], kind = 'mergesort', inplace = True)
+    data.reset_index(drop = True, inplace = True)
+
+    before = data.memory_usage(deep = True)
+    data = compactDtypes(data)
+    logMemory("compacted data.csv", data, before)
+    return data
+
+def narrowest(values):
+    #Smallest int, or float32, that holds every value of a float column exactly
+    finite = np.isfinite(values)
+    if finite.all() and (values == np.round(values)).all():
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype)
+    single = values.astype(np.float32)
+    if np.array_equal(single.astype(np.float64), values, equal_nan = True):
+        return single
+    return values
+
+def compactDtypes(data):
+    #Repeated strings become categoricals with sorted categories, so the location codes
+    #follow the (location, date) sort and can stand in for the country names
+    compact = {}
+    for col in data.columns:
+        if data[col].dtype.kind in 'OSU' or isinstance(data[col].dtype, pd.StringDtype):
+            compact[col] = pd.Categorical(data[col].astype(object))
+        elif data[col].dtype.kind == 'f':
+            compact[col] = narrowest(data[col].to_numpy())
+        else:
+            compact[col] = data[col]
+    return pd.DataFrame(compact, index = data.index)
+
+def logMemory(title, data, before = None):
+    after = data.memory_usage(deep = True)
+    if before is None:
+        columns = ', '.join("%s %s %.1fkB" % (col, data[col].dtype, after[col] / 1024) for col in data.columns)
+        log.info("%s: %d rows, %.1fMB (%s)", title, len(data), after.sum() / 2 ** 20, columns)
+    else:
+        columns = ', '.join("%s %.1f->%.1fkB" % (col, before[col] / 1024, after[col] / 1024) for col in data.columns)
+        log.info("%s: %d rows, %.1fMB -> %.1fMB (%s)", title, len(data), before.sum() / 2 ** 20,
+                 after.sum() / 2 ** 20, columns)
+
+class CountryIndex:
+    #Row offsets of every country in a frame sorted by (location, date)
+    def __init__(self, data):
+        #Boundaries are found on the integer category codes rather than on the names
+        codes = data['location'].cat.codes.to_numpy()
+        categories = data['location'].cat.categories
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        stops = np.r_[starts[1:], len(codes)]
+        self.offsets = {categories[codes[start]]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+        self.days = data['date'].to_numpy().astype('datetime64[ns]').view('i8')
+
+    def rows(self, country, start_date = None, end_date = None):
+        #Rows of country, optionally cut to [start_date, end_date] by bisecting its dates
+        start, stop = self.offsets[country]
+        days = self.days[start:stop]
+        if start_date is not None:
+            start += int(np.searchsorted(days, pd.Timestamp(start_date).value, 'left'))
+        if end_date is not None:
+            stop -= len(days) - int(np.searchsorted(days, pd.Timestamp(end_date).value, 'right'))
+        return slice(start, stop)
+
+def fileStamp(path):
+    st = os.stat(path)
+    return {'format': cache_format, 'size': str(st.st_size), 'mtime_ns': str(st.st_mtime_ns)}
+
+def fileHash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def readCacheMeta(cache_path):
+    try:
+        with pa.memory_map(cache_path) as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return {k.decode(): v.decode() for k, v in meta.items()}
+
+def readCache(cache_path):
+    #Uncompressed feather over a memory map, so numeric columns are not copied on load
+    table = feather.read_table(cache_path, memory_map = True)
+    return table.to_pandas(split_blocks = True)
+
+def writeCache(data, cache_path, meta):
+    #Floats are written as-is (NaN rather than null) so reading them back stays zero-copy
+    arrays = [pa.array(data[c].to_numpy(), from_pandas = False) if data[c].dtype.kind == 'f'
+              else pa.Array.from_pandas(data[c]) for c in data.columns]
+    table = pa.Table.from_arrays(arrays, names = list(data.columns))
+    table = table.replace_schema_metadata(meta)
+    tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    feather.write_feather(table, tmp_path, compression = 'uncompressed')
+    os.replace(tmp_path, cache_path)
+
+class CacheLock:
+    #Exclusive lock on cache_path + '.lock' across the processes of the host. The first one to find the
+    #cache stale parses the CSV and writes it, the others wait here and then map what it wrote.
+    def __init__(self, cache_path):
+        self.path = cache_path + '.lock'
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        #Closing the file releases the lock
+        self.file.close()
+
+def loadData(path = "data.csv", cache_path = None):
+    #Returns the cleaned frame and the sha256 of the CSV it came from
+    if pa is None:
+        return readCsv(path), fileHash(path)
+    cache_path = cache_path or path + ".feather"
+
+    stamp = fileStamp(path)
+    meta = readCacheMeta(cache_path)
+    if meta is not None and all(meta.get(k) == v for k, v in stamp.items()):
+        return readCache(cache_path), meta['sha256']
+
+    with CacheLock(cache_path):
+        #Another process may have written the cache while this one waited for the lock
+        meta = readCacheMeta(cache_path)
+        if meta is not None and all(meta.get(k) == v for k, v in stamp.items()):
+            return readCache(cache_path), meta['sha256']
+
+        #The file was touched, only reparse if its contents actually changed
+        digest = fileHash(path)
+        if meta is not None and meta.get('format') == cache_format and meta.get('sha256') == digest:
+            data = readCache(cache_path)
+        else:
+            data = readArrowCsv(path)
+        writeCache(data, cache_path, dict(stamp, sha256 = digest))
+    #Serve from the map even after a cold parse, so forked workers share the file pages
+    return readCache(cache_path), digest
+
+def ffill(values):
+    #Carries the last reported value of every column down over missing days
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis = 0, out = rows)
+    return values[rows, np.arange(values.shape[1])]
+
+def shifted(values, days):
+    #values moved down by days rows, the first rows left empty
+    result = np.full(values.shape, np.nan)
+    result[days:] = values[:len(values) - days]
+    return result
+
+def rollingMean(values, window):
+    #Mean of the reported values among the last window days of every column
+    reported = np.isfinite(values)
+    sums = np.cumsum(np.where(reported, values, 0), axis = 0)
+    counts = np.cumsum(reported, axis = 0)
+    sums[window:] -= sums[:-window].copy()
+    counts[window:] -= counts[:-window].copy()
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def growthRate(values):
+    #Day over day change of a running total in percent
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        rate = (values / shifted(values, 1) - 1) * 100
+    rate[~np.isfinite(rate)] = np.nan
+    return rate
+
+def doublingTime(values, window = 7):
+    #Days a running total takes to double at the growth of the last window days, empty without growth
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        days = window * np.log(2) / np.log(values / shifted(values, window))
+    days[~np.isfinite(days) | (days <= 0)] = np.nan
+    return days
+
+class DailyTable:
+    #Dense date x country matrices of the daily columns, filled in one pass over the sorted frame
+    columns = ['new_cases', 'new_deaths', 'total_cases', 'total_deaths']
+    cumulative = ['total_cases', 'total_deaths']
+    #Matrices computed from the columns over the whole date axis at once, name: (column, function)
+    derived = {'new_cases_avg7': ('new_cases', lambda values: rollingMean(values, 7)),
+               'new_cases_avg14': ('new_cases', lambda values: rollingMean(values, 14)),
+               'new_deaths_avg7': ('new_deaths', lambda values: rollingMean(values, 7)),
+               'new_deaths_avg14': ('new_deaths', lambda values: rollingMean(values, 14)),
+               'total_cases_growth': ('total_cases', growthRate),
+               'total_cases_doubling': ('total_cases', doublingTime),
+               'total_deaths_growth': ('total_deaths', growthRate),
+               'total_deaths_doubling': ('total_deaths', doublingTime)}
+
+    def __init__(self, data, index):
+        self.dates, date_pos = np.unique(data['date'].to_numpy().astype('datetime64[ns]'), return_inverse = True)
+        self.countries = list(index.offsets)
+        runs = [stop - start for start, stop in index.offsets.values()]
+        country_pos = np.repeat(np.arange(len(self.countries)), runs)
+
+        self.date_rows = {date: row for row, date in enumerate(self.dates.view('i8').tolist())}
+        self.country_cols = {country: col for col, country in enumerate(self.countries)}
+        #ISO 3166 alpha-3 code of every country column, what the map locates countries by
+        self.iso_codes = data['iso_code'].iloc[[start for start, stop in index.offsets.values()]].astype(str).tolist()
+
+        self.values = {}
+        self.world = {}
+        for name in self.columns:
+            values = np.full((len(self.dates), len(self.countries)), np.nan)
+            values[date_pos, country_pos] = data[name].to_numpy(dtype = float)
+            if name in self.cumulative:
+                values = ffill(values)
+            self.values[name] = values
+            self.world[name] = np.nansum(values, axis = 1)
+        self.derive()
+
+    def derive(self):
+        for name, (col, function) in self.derived.items():
+            self.values[name] = function(self.values[col])
+
+    def appended(self, delta, countries):
+        #Copy with the rows of delta written in. Returns None unless every row adds a day
+        #after the last one of its country and the country axis did not change.
+        if countries != self.countries:
+            return None
+        days = delta['date'].to_numpy().astype('datetime64[ns]')
+        dates = np.union1d(self.dates, days)
+        if not np.array_equal(dates[:len(self.dates)], self.dates):
+            return None
+
+        table = object.__new__(DailyTable)
+        table.dates = dates
+        table.countries = self.countries
+        table.country_cols = self.country_cols
+        table.iso_codes = self.iso_codes
+        table.date_rows = {date: row for row, date in enumerate(dates.view('i8').tolist())}
+
+        rows = np.searchsorted(dates, days)
+        cols = np.array([self.country_cols[country] for country in delta['location'].astype(str)])
+        #First new row of every country, countries without new rows get one past the end
+        first = np.full(len(self.countries), len(dates))
+        np.minimum.at(first, cols, rows)
+        start = max(0, min(int(first.min()), len(self.dates)) - 1)
+        carried = np.arange(len(dates))[:, None] >= first[None, :]
+
+        table.values = {}
+        table.world = {}
+        for name in self.columns:
+            values = np.vstack([self.values[name], np.full((len(dates) - len(self.dates), len(self.countries)), np.nan)])
+            if name in self.cumulative:
+                #Past its last report a country only held carried values, carry the new ones instead
+                values[carried] = np.nan
+            values[rows, cols] = delta[name].to_numpy(dtype = float)
+            if name in self.cumulative:
+                values[start:] = ffill(values[start:])
+            world = self.world[name].copy()
+            world.resize(len(dates), refcheck = False)
+            world[start:] = np.nansum(values[start:], axis = 1)
+            table.values[name] = values
+            table.world[name] = world
+        table.derive()
+        return table
+
+    def latest(self):
+        return pd.Timestamp(self.dates[-1])
+
+    def row(self, date):
+        #Row of date, None for a day the table does not have or no date at all
+        date = pd.Timestamp(date)
+        if pd.isna(date):
+            return None
+        return self.date_rows.get(date.normalize().value)
+
+    def value(self, name, row, country):
+        return self.values[name][row, self.country_cols[country]]
+
+    def gather(self, name, countries, start_date = None, end_date = None):
+        #Dates of the range and a dates x countries copy of their columns, no frame is touched
+        start, stop = 0, len(self.dates)
+        if start_date is not None:
+            start = int(np.searchsorted(self.dates, pd.Timestamp(start_date).to_datetime64(), 'left'))
+        if end_date is not None:
+            stop = int(np.searchsorted(self.dates, pd.Timestamp(end_date).to_datetime64(), 'right'))
+        cols = [self.country_cols[country] for country in countries]
+        return self.dates[start:stop], self.values[name][start:stop, cols]
+
+class Snapshot:
+    #Everything derived from one version of data.csv, never modified once built.
+    #changed names the countries that differ from the previous snapshot, None meaning all of them.
+    #With a series_dir the frame goes to an SQLite file there and the snapshot keeps only the tables
+    #built from it, otherwise the frame stays in memory and the plots slice it.
+    def __init__(self, data, version, df_pop = None, daily = None, changed = None, series_dir = None):
+        self.version = version
+        self.changed = changed
+        self.series_dir = series_dir
+        index = CountryIndex(data)
+
+        if df_pop is None:
+            df_pop = data.groupby('location', observed = True).agg({'population':'max','total_cases':'max','total_deaths':'max'})
+        self.df_pop = df_pop
+
+        x = self.df_pop[['total_cases','total_deaths']].reset_index()
+        x.columns = ['Country', "Total Cases", "Total Deaths"]
+        x.sort_values("Total Cases",ascending = False, inplace = True)
+        x.reset_index(drop = True, inplace = True)
+        self.x = x
+        self.x_order = sortOrders(x)
+
+        self.top_ten = x[:10]
+
+        self.daily = daily if daily is not None else DailyTable(data, index)
+        self.as_of = self.daily.latest()
+        logMemory("snapshot %s" % version[:12], data)
+
+        if series_dir is None:
+            self.data = data
+            self.series = PandasSeries(data, index)
+            self.memory = data.memory_usage(deep = True)
+        else:
+            path = seriesPath(series_dir, version)
+            #One worker writes the file of a version, the others wait and open it
+            with CacheLock(path):
+                self.series = SqliteSeries(data, path)
+            self.data = None
+            self.memory = pd.Series(dtype = np.int64)
+
+    def frame(self):
+        #The whole frame, read back from the series file when the snapshot does not hold it
+        return self.series.frame()
+
+def dayKeys(codes, dates):
+    #(location code, day) packed into one integer that sorts like the frame
+    return codes.astype(np.int64) * (1 << 24) + dates.astype('datetime64[D]').view('i8')
+
+def plainColumns(data):
+    return data.astype({col: object for col in data.columns if isinstance(data[col].dtype, pd.CategoricalDtype)})
+
+def sharedFrame(data, cache_path, version):
+    #data served from an uncompressed feather file over a memory map, as loadData serves data.csv, so
+    #the workers that ingest the same delta share its pages. The first of them writes the file.
+    if pa is None or cache_path is None:
+        return data
+    with CacheLock(cache_path):
+        meta = readCacheMeta(cache_path)
+        if meta is None or meta.get('version') != version:
+            writeCache(data, cache_path, {'format': cache_format, 'version': version})
+    return readCache(cache_path)
+
+def appendRows(snap, delta, version, cache_path = None):
+    #Snapshot of snap with the rows of delta added, None if delta has nothing new.
+    #Rows that only extend countries past their last day are merged in place and the aggregates
+    #updated from the delta alone, anything else falls back to a full rebuild. The merged frame
+    #is written to cache_path and mapped back from it when one is given.
+    series_dir = snap.series_dir
+    data = snap.frame()
+    categories = {col: data[col].cat.categories.union(pd.Index(delta[col].dropna().astype(str).unique()))
+                  for col in data.columns if isinstance(data[col].dtype, pd.CategoricalDtype)}
+    def codes(frame, col):
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            remap = np.r_[categories[col].get_indexer(frame[col].cat.categories), -1]
+            return remap[frame[col].cat.codes.to_numpy()]
+        return categories[col].get_indexer(frame[col].astype(str))
+
+    old_keys = dayKeys(codes(data, 'location'), data['date'].to_numpy())
+    new_codes = codes(delta, 'location')
+    new_keys = dayKeys(new_codes, delta['date'].to_numpy())
+    pos = np.searchsorted(old_keys, new_keys)
+    last = max(len(old_keys) - 1, 0)
+    fresh = (pos == len(old_keys)) | (old_keys[np.minimum(pos, last)] != new_keys)
+    if not fresh.any():
+        return None
+    delta, pos, new_codes = delta[fresh].reset_index(drop = True), pos[fresh], new_codes[fresh]
+    changed = set(delta['location'].astype(str))
+
+    #Appending means the old row in front of which a new row lands belongs to a later country
+    next_codes = codes(data, 'location')[np.minimum(pos, last)]
+    if not ((pos == len(old_keys)) | (next_codes != new_codes)).all():
+        merged = pd.concat([plainColumns(data), plainColumns(delta)], ignore_index = True)
+        merged.sort_values(['location', 'date'], kind = 'mergesort', inplace = True)
+        merged.reset_index(drop = True, inplace = True)
+        return Snapshot(sharedFrame(compactDtypes(merged), cache_path, version), version, changed = changed,
+                        series_dir = series_dir)
+
+    columns = {}
+    for col in data.columns:
+        if col in categories:
+            columns[col] = pd.Categorical.from_codes(np.insert(codes(data, col), pos, codes(delta, col)), categories[col])
+        else:
+            old, new = data[col].to_numpy(), delta[col].to_numpy()
+            dtype = old.dtype if old.dtype.kind == 'M' else np.result_type(old.dtype, new.dtype)
+            columns[col] = np.insert(old.astype(dtype, copy = False), pos, new.astype(dtype))
+    merged = sharedFrame(pd.DataFrame(columns), cache_path, version)
+
+    df_pop = snap.df_pop.copy()
+    df_pop.index = df_pop.index.astype(str)
+    delta_pop = delta.groupby(delta['location'].astype(str))[list(df_pop.columns)].max()
+    df_pop = df_pop.combine(delta_pop, np.fmax)
+    df_pop.index.name = 'location'
+    for col in df_pop.columns:
+        #combine() hands back floats, keep the compact dtype when the maxima still fit it
+        values = df_pop[col].to_numpy(dtype = float)
+        df_pop[col] = values.astype(np.result_type(snap.df_pop[col].dtype, narrowest(values).dtype))
+
+    daily = snap.daily.appended(delta, list(df_pop.index))
+    return Snapshot(merged, version, df_pop = df_pop, daily = daily, changed = changed, series_dir = series_dir)
+
+class Dataset:
+    #Holds the live Snapshot of a CSV and swaps in a rebuilt one when the file changes.
+    #Callbacks grab current() once, so a request started before a swap finishes on the old snapshot.
+    def __init__(self, path = "data.csv", delta_dir = None, lazy = False, delta_settle = 10, series_dir = None):
+        self.path = path
+        #Snapshots keep their frame in SQLite files in series_dir rather than in memory, see Snapshot
+        self.series_dir = series_dir
+        self.retired = None
+        #Daily files dropped in delta_dir are appended on top of data.csv, see ingestNew()
+        self.delta_dir = delta_dir
+        self.delta_settle = delta_settle
+        #(name, size, mtime_ns) of the delta files applied, and of the ones seen on the last poll
+        self.applied = set()
+        self.seen = {}
+        self.listeners = []
+        self.lock = threading.RLock()
+        self.snapshot = None
+        #A lazy dataset is loaded by the first current(), listeners see that load as a swap
+        if not lazy:
+            self.load()
+
+    def load(self):
+        with self.lock:
+            if self.snapshot is None:
+                self.stamp = fileStamp(self.path)
+                self.swap(Snapshot(*loadData(self.path), series_dir = self.series_dir))
+                if self.series_dir is not None:
+                    #Files of versions left behind by earlier runs
+                    for version in seriesVersions(self.series_dir):
+                        if version != self.snapshot.version[:16]:
+                            removeSeries(self.series_dir, version)
+                self.ingestNew()
+            return self.snapshot
+
+    def current(self):
+        snapshot = self.snapshot
+        return snapshot if snapshot is not None else self.load()
+
+    def onSwap(self, listener):
+        self.listeners.append(listener)
+
+    def swap(self, snapshot):
+        for listener in self.listeners:
+            listener(snapshot)
+        previous, self.snapshot = self.snapshot, snapshot
+        if self.series_dir is not None and previous is not None:
+            #Callbacks may still run on the previous snapshot, the file of the one before it can go
+            if self.retired is not None and self.retired != snapshot.version:
+                removeSeries(self.series_dir, self.retired)
+            self.retired = previous.version
+
+    def reload(self):
+        with self.lock:
+            if self.snapshot is None:
+                self.load()
+                return True
+            stamp = fileStamp(self.path)
+            if stamp == self.stamp:
+                return self.ingestNew()
+            snapshot = Snapshot(*loadData(self.path), series_dir = self.series_dir)
+            self.stamp = stamp
+            if snapshot.version == self.snapshot.version:
+                return self.ingestNew()
+            self.swap(snapshot)
+            #Deltas go on top of the new file again, the rows it already has are skipped
+            self.applied = set()
+            self.ingestNew()
+            return True
+
+    def ingest(self, path):
+        #Appends the (location, date) rows of a delta CSV in data.csv's format that are not loaded yet.
+        #Returns the countries that changed. pyarrow rejects a short last row where pandas would fill
+        #it with NaN, so a file cut off mid-row raises instead of being half applied.
+        with self.lock:
+            delta = readArrowCsv(path) if pa is not None else readCsv(path)
+            version = hashlib.sha256((self.snapshot.version + fileHash(path)).encode()).hexdigest()
+            #The merged frame of every delta replaces the previous one in a single file, unless the
+            #snapshots keep it in their series files
+            cache_path = self.path + '.delta.feather' if self.series_dir is None else None
+            snapshot = appendRows(self.snapshot, delta, version, cache_path = cache_path)
+            if snapshot is None:
+                return set()
+            self.swap(snapshot)
+            log.info("ingested %s: %d countries changed", path, len(snapshot.changed))
+            return snapshot.changed
+
+    def ingestNew(self):
+        #Only complete files are ingested: hidden and temporary names are skipped, and a file must
+        #keep its size and mtime since the previous poll, or be delta_settle seconds old. A file that
+        #is published again with other contents is ingested again.
+        if not self.delta_dir or not os.path.isdir(self.delta_dir):
+            return False
+        seen, self.seen = self.seen, {}
+        now = time.time()
+        changed = False
+        for name in sorted(os.listdir(self.delta_dir)):
+            if name.startswith('.') or not name.endswith('.csv'):
+                continue
+            path = os.path.join(self.delta_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = (name, st.st_size, st.st_mtime_ns)
+            if key in self.applied:
+                continue
+            if seen.get(name) != key and now - st.st_mtime < self.delta_settle:
+                self.seen[name] = key
+                continue
+            changed |= bool(self.ingest(path))
+            self.applied.add(key)
+        return changed
+
+    def watch(self, interval = 60):
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception:
+                    #Half written file or a real fault, keep serving the current snapshot and retry next round
+                    log.exception("reloading %s failed, still serving the current snapshot", self.path)
+        thread = threading.Thread(target = poll, name = 'dataset-watcher', daemon = True)
+        thread.start()
+        return thread
@@ -0,0 +1,302 @@
+import argparse
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+import synthetic
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+#Runs the app the way `python app.py` does, minus the debug reloader
+server_script = """
+import sys
+import app
+app.prepare()
+app.app.run_server(host = '127.0.0.1', port = int(sys.argv[1]), debug = False)
+"""
+
+class Stats:
+    #Latencies and failures of every request, by the callback (or page) it was for
+    def __init__(self):
+        self.times = {}
+        self.errors = {}
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def record(self, name, elapsed, error = None):
+        with self.lock:
+            self.times.setdefault(name, []).append(elapsed)
+            if error is not None:
+                self.errors.setdefault(name, {}).setdefault(error, 0)
+                self.errors[name][error] += 1
+
+    def report(self, duration):
+        results = {}
+        for name, times in sorted(self.times.items()):
+            times = np.asarray(times) * 1000
+            errors = sum(self.errors.get(name, {}).values())
+            results[name] = {'requests': len(times),
+                             'per_second': len(times) / duration,
+                             'errors': errors,
+                             'error_rate': errors / len(times),
+                             'error_kinds': self.errors.get(name, {}),
+                             'mean_ms': float(times.mean()),
+                             'p50_ms': float(np.percentile(times, 50)),
+                             'p95_ms': float(np.percentile(times, 95)),
+                             'p99_ms': float(np.percentile(times, 99))}
+        return results
+
+def outputName(output):
+    #'..a.children...b.children..' -> 'a.children+1', short enough for the report
+    outputs = output.strip('.').split('...') if output.startswith('..') else [output]
+    return outputs[0] + ('+%d' % (len(outputs) - 1) if len(outputs) > 1 else '')
+
+class Session:
+    #One visitor: keeps the props of the components it has rendered and, like the dash renderer,
+    #posts every server callback whose inputs changed. Clientside callbacks run in the browser, so
+    #they cost nothing here; the one output the server needs from them, viewport.data, is preset.
+    def __init__(self, url, stats, viewport):
+        self.url = url
+        self.stats = stats
+        self.viewport = viewport
+        self.props = {}
+        self.types = {}
+
+    def request(self, name, path, body = None):
+        headers = {'Accept-Encoding': 'gzip'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url + path, data, headers), timeout = 60) as response:
+                payload = response.read()
+                status = response.status
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    payload = gzip.decompress(payload)
+        except urllib.error.HTTPError as e:
+            self.stats.record(name, time.perf_counter() - start, 'HTTP %d' % e.code)
+            return None
+        except (OSError, ValueError) as e:
+            self.stats.record(name, time.perf_counter() - start, type(e).__name__)
+            return None
+        self.stats.record(name, time.perf_counter() - start)
+        return json.loads(payload) if payload and status == 200 and path != '/' else None
+
+    def collect(self, node):
+        #Props of every component with an id in a layout (or children) tree
+        if isinstance(node, list):
+            for child in node:
+                self.collect(child)
+        elif isinstance(node, dict) and 'props' in node:
+            props = node['props']
+            if isinstance(props.get('id'), str):
+                self.types[props['id']] = node['type']
+                for prop, value in props.items():
+                    if prop != 'children':
+                        self.props[props['id'] + '.' + prop] = value
+                if node['type'] == 'Location':
+                    self.props[props['id'] + '.pathname'] = '/'
+            self.collect(props.get('children'))
+
+    def rendered(self, callback):
+        return all(prop.rsplit('.', 1)[0] in self.types for prop in callback['input_props'] + callback['output_props'])
+
+    def loadPage(self):
+        self.request('page', '/')
+        layout = self.request('layout', '/_dash-layout')
+        dependencies = self.request('dependencies', '/_dash-dependencies')
+        if layout is None or dependencies is None:
+            return False
+        self.callbacks = []
+        for dependency in dependencies:
+            if dependency.get('clientside_function'):
+                continue
+            output = dependency['output']
+            dependency['output_props'] = output.strip('.').split('...') if output.startswith('..') else [output]
+            dependency['input_props'] = [spec['id'] + '.' + spec['property'] for spec in dependency['inputs']]
+            self.callbacks.append(dependency)
+        self.props, self.types = {}, {}
+        self.collect(layout)
+        self.props['viewport.data'] = self.viewport
+        self.fire([callback for callback in self.callbacks
+                   if self.rendered(callback) and not callback.get('prevent_initial_call')], [])
+        return True
+
+    def change(self, values):
+        #A user edit of some props, posts the callbacks listening to them
+        self.props.update(values)
+        self.fire([callback for callback in self.callbacks
+                   if self.rendered(callback) and set(callback['input_props']) & set(values)], list(values))
+
+    def fire(self, pending, changed):
+        #A callback waits while another pending one outputs one of its inputs, as in the renderer
+        triggered = {id(callback): list(changed) for callback in pending}
+        while pending:
+            upstream = {prop for callback in pending for prop in callback['output_props']}
+            ready = [callback for callback in pending if not set(callback['input_props']) & upstream] or pending[:1]
+            for callback in ready:
+                pending.remove(callback)
+                new = self.post(callback, triggered.pop(id(callback), []))
+                for prop, value in new.items():
+                    self.props[prop] = value
+                    if prop.endswith('.children'):
+                        before = set(self.types)
+                        self.collect(value)
+                        if set(self.types) != before:
+                            #Callbacks of the components just added fire once, like on page load
+                            added = set(self.types) - before
+                            for other in self.callbacks:
+                                components = {p.rsplit('.', 1)[0] for p in other['input_props'] + other['output_props']}
+                                if (other not in pending and self.rendered(other) and not other.get('prevent_initial_call')
+                                        and components & added):
+                                    pending.append(other)
+                                    triggered.setdefault(id(other), [])
+                for other in self.callbacks:
+                    hits = set(other['input_props']) & set(new)
+                    if hits and self.rendered(other):
+                        if other not in pending:
+                            pending.append(other)
+                        triggered.setdefault(id(other), []).extend(hits)
+
+    def post(self, callback, changed):
+        def spec(specs):
+            return [dict(item, value = self.props.get(item['id'] + '.' + item['property'])) for item in specs]
+        outputs = [dict(zip(['id', 'property'], prop.rsplit('.', 1))) for prop in callback['output_props']]
+        body = {'output': callback['output'],
+                'outputs': outputs if len(outputs) > 1 else outputs[0],
+                'inputs': spec(callback['inputs']),
+                'state': spec(callback['state']),
+                'changedPropIds': changed}
+        response = self.request(outputName(callback['output']), '/_dash-update-component', body)
+        new = {}
+        for component, values in ((response or {}).get('response') or {}).items():
+            for prop, value in values.items():
+                new[component + '.' + prop] = value
+        return new
+
+    def selectRow(self, rng):
+        rows = self.props.get('countries.data') or []
+        if rows:
+            row = int(rng.integers(len(rows)))
+            self.change({'countries.selected_rows': [row], 'countries.selected_row_ids': [rows[row]['id']]})
+
+    def toggleRadios(self, rng):
+        #Line/bar radios, which only clientside callbacks listen to
+        for component, kind in self.types.items():
+            options = self.props.get(component + '.options') or []
+            if kind == 'RadioItems' and options and rng.random() < 0.5:
+                self.change({component + '.value': options[int(rng.integers(len(options)))]['value']})
+
+def runUser(url, stats, deadline, args, seed):
+    rng = np.random.default_rng(seed)
+    while time.time() < deadline:
+        session = Session(url, stats, args.viewport)
+        if session.loadPage():
+            for _ in range(args.selections):
+                if time.time() >= deadline:
+                    break
+                time.sleep(args.think * rng.random())
+                session.selectRow(rng)
+                session.toggleRadios(rng)
+            with stats.lock:
+                stats.sessions += 1
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def startServer(workdir, timeout):
+    port = freePort()
+    env = dict(os.environ, PYTHONPATH = here, DATA_RELOAD_INTERVAL = '0')
+    log = open(os.path.join(workdir, 'loadtest-server.log'), 'w')
+    server = subprocess.Popen([sys.executable, '-c', server_script, str(port)], cwd = workdir, env = env,
+                              stdout = log, stderr = subprocess.STDOUT)
+    url = 'http://127.0.0.1:%d' % port
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited with %d, see %s" % (server.returncode, log.name))
+        try:
+            urllib.request.urlopen(url + '/_dash-layout', timeout = 5).read()
+            return server, url
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("server did not answer within %d s, see %s" % (timeout, log.name))
+
+def printReport(results, summary):
+    print("%-40s %8s %8s %7s %9s %9s %9s" % ("callback", "requests", "req/s", "errors", "p50 ms", "p95 ms", "p99 ms"))
+    for name, result in results.items():
+        print("%-40s %8d %8.1f %6.1f%% %9.1f %9.1f %9.1f" % (name, result['requests'], result['per_second'],
+                                                              result['error_rate'] * 100, result['p50_ms'],
+                                                              result['p95_ms'], result['p99_ms']))
+    print("\n%(sessions)d sessions, %(requests)d requests in %(duration).1f s: %(requests_per_second).1f req/s, "
+          "%(error_rate).2f%% errors, %(users)d users" % dict(summary, error_rate = summary['error_rate'] * 100))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Replay dashboard sessions against a local server and report latencies')
+    parser.add_argument('--url', help = 'load an already running server instead of starting one')
+    parser.add_argument('--workdir', help = 'directory with the data.csv to serve, synthetic data when not given')
+    parser.add_argument('--countries', type = int, default = 200)
+    parser.add_argument('--days', type = int, default = 300)
+    parser.add_argument('--users', type = int, default = 8, help = 'concurrent sessions')
+    parser.add_argument('--duration', type = float, default = 30, help = 'seconds to run')
+    parser.add_argument('--selections', type = int, default = 5, help = 'country rows picked per session')
+    parser.add_argument('--think', type = float, default = 0.5, help = 'longest pause between actions, in seconds')
+    parser.add_argument('--viewport', type = int, default = 1920)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--startup-timeout', type = float, default = 120)
+    parser.add_argument('--output', help = 'write the results as JSON')
+    args = parser.parse_args()
+
+    tmp, server, url = None, None, args.url
+    if url is None:
+        workdir = args.workdir
+        if workdir is None:
+            tmp = tempfile.TemporaryDirectory()
+            workdir = tmp.name
+            synthetic.generate(os.path.join(workdir, 'data.csv'), args.countries, args.days, seed = args.seed)
+        server, url = startServer(workdir, args.startup_timeout)
+    try:
+        stats = Stats()
+        start = time.time()
+        users = [threading.Thread(target = runUser, args = (url, stats, start + args.duration, args, args.seed + i),
+                                  daemon = True)
+                 for i in range(args.users)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        duration = time.time() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if tmp is not None:
+            tmp.cleanup()
+
+    results = stats.report(duration)
+    requests = sum(result['requests'] for result in results.values())
+    errors = sum(result['errors'] for result in results.values())
+    summary = {'users': args.users, 'duration': duration, 'sessions': stats.sessions, 'requests': requests,
+               'requests_per_second': requests / duration, 'error_rate': errors / max(1, requests)}
+    printReport(results, summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'params': vars(args), 'summary': summary, 'results': results}, f, indent = 2)
+
+if __name__ == '__main__':
+    main()
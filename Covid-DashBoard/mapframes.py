@@ -0,0 +1,28 @@
+import numpy as np
+
+#Decimals the map values are rounded to, so a country without new reports keeps the same value
+decimals = 1
+
+def nullable(values):
+    #JSON has no NaN, countries without a value yet are sent as null
+    return [None if value != value else value for value in values.tolist()]
+
+def encodeFrames(dates, values):
+    #Every date of a dates x countries matrix, as the values of the first date followed by the
+    #columns that changed and their new values for each next date. Dates where most countries
+    #changed send the whole row (null for the columns) instead. assets/covid.js replays them.
+    values = np.round(values, decimals)
+    previous, following = values[:-1], values[1:]
+    same = (following == previous) | (np.isnan(following) & np.isnan(previous))
+    changes = []
+    for row, unchanged in enumerate(same, 1):
+        cols = np.flatnonzero(~unchanged)
+        if 2 * len(cols) > values.shape[1]:
+            changes.append([None, nullable(values[row])])
+        else:
+            changes.append([cols.tolist(), nullable(values[row, cols])])
+    finite = values[np.isfinite(values)]
+    return {'dates': [str(date)[:10] for date in dates],
+            'first': nullable(values[0]),
+            'changes': changes,
+            'zmax': float(finite.max()) if len(finite) else 0.0}
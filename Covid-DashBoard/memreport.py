@@ -0,0 +1,53 @@
+import os
+import sys
+
+#Resident memory of the gunicorn master and its workers, read from /proc (Linux only).
+#PSS splits shared pages between the processes mapping them, so its sum is the real
+#footprint; Shared is what a worker reads from pages it shares with the others.
+#Usage: python memreport.py [master pid]
+
+def rollup(pid):
+    values = {}
+    with open('/proc/%d/smaps_rollup' % pid) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    values['Shared'] = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+    return values
+
+def children(pid):
+    with open('/proc/%d/task/%d/children' % (pid, pid)) as f:
+        return [int(child) for child in f.read().split()]
+
+def isGunicorn(pid):
+    #gunicorn runs as "gunicorn ..." or "python .../gunicorn ..."
+    try:
+        with open('/proc/%d/cmdline' % pid, 'rb') as f:
+            argv = f.read().split(b'\0')
+    except OSError:
+        return False
+    return any(os.path.basename(arg) == b'gunicorn' for arg in argv[:2])
+
+def parent(pid):
+    with open('/proc/%d/stat' % pid) as f:
+        return int(f.read().rsplit(')', 1)[1].split()[1])
+
+def findMaster():
+    for name in os.listdir('/proc'):
+        if name.isdigit() and isGunicorn(int(name)) and not isGunicorn(parent(int(name))):
+            return int(name)
+    return None
+
+if __name__ == '__main__':
+    master = int(sys.argv[1]) if len(sys.argv) > 1 else findMaster()
+    if master is None:
+        sys.exit("no gunicorn master found, pass its pid")
+
+    print("%-8s %-8s %10s %10s %10s" % ("pid", "role", "RSS MB", "PSS MB", "Shared MB"))
+    total = 0
+    for role, pid in [('master', master)] + [('worker', child) for child in children(master)]:
+        mem = rollup(pid)
+        total += mem['Pss']
+        print("%-8d %-8s %10.1f %10.1f %10.1f" % (pid, role, mem['Rss'] / 1024, mem['Pss'] / 1024, mem['Shared'] / 1024))
+    print("total PSS %.1f MB" % (total / 1024))
@@ -0,0 +1,174 @@
+import bisect
+import collections
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+
+import flask
+
+log = logging.getLogger(__name__)
+
+#Prometheus histogram bounds, seconds for timings and bytes for payloads
+time_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+size_buckets = [1000, 5000, 10000, 50000, 100000, 250000, 500000, 1000000, 5000000]
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = collections.OrderedDict()
+        self.gauges = collections.OrderedDict()
+
+    def observe(self, name, labels, value, buckets = time_buckets):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.histograms.setdefault(name, {})
+            if key not in family:
+                family[key] = Histogram(buckets)
+            family[key].observe(value)
+
+    def gauge(self, name, collect):
+        #collect() returns {labels tuple: value} at scrape time
+        self.gauges[name] = collect
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, family in self.histograms.items():
+                lines.append("# TYPE %s histogram" % name)
+                for key, histogram in family.items():
+                    labels = ''.join('%s="%s",' % item for item in key)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append('%s_bucket{%sle="%s"} %d' % (name, labels, bound, cumulative))
+                    lines.append('%s_sum{%s} %f' % (name, labels.rstrip(','), histogram.sum))
+                    lines.append('%s_count{%s} %d' % (name, labels.rstrip(','), cumulative))
+        for name, collect in self.gauges.items():
+            lines.append("# TYPE %s gauge" % name)
+            for key, value in collect().items():
+                labels = ','.join('%s="%s"' % item for item in key)
+                lines.append('%s{%s} %s' % (name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+current = threading.local()
+
+class phase:
+    #Times a block of the running callback, e.g. with phase('slice'): ...
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        callback = getattr(current, 'callback', None)
+        if callback is not None:
+            registry.observe('dash_callback_phase_seconds', {'callback': callback, 'phase': self.name},
+                             time.perf_counter() - self.start)
+
+def timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        current.callback = func.__name__
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current.callback_seconds = time.perf_counter() - start
+            registry.observe('dash_callback_seconds', {'callback': func.__name__}, current.callback_seconds)
+    return wrapper
+
+class SlowRequestProfiler:
+    #Samples the stacks of threads serving callbacks and logs the collapsed
+    #stacks of requests slower than threshold seconds
+    def __init__(self, threshold, interval = 0.005):
+        self.threshold = threshold
+        self.interval = interval
+        self.samples = {}
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def begin(self):
+        #The sampler starts with the first request of the process serving it, a thread started
+        #at import would only live in the preloaded gunicorn master and never see a worker
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.samples = {}
+                    threading.Thread(target = self.sample, name = 'slow-request-profiler', daemon = True).start()
+                    self.pid = os.getpid()
+        self.samples[threading.get_ident()] = collections.Counter()
+
+    def end(self, callback, elapsed):
+        samples = self.samples.pop(threading.get_ident(), None)
+        if samples and elapsed >= self.threshold:
+            stacks = '\n'.join("%s %d" % (stack, count) for stack, count in samples.most_common(20))
+            log.warning("slow callback %s took %.3fs, sampled stacks:\n%s", callback, elapsed, stacks)
+
+    def sample(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, samples in list(self.samples.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append("%s:%s" % (frame.f_code.co_filename.rsplit('/', 1)[-1], frame.f_code.co_name))
+                    frame = frame.f_back
+                samples[';'.join(reversed(stack))] += 1
+
+def instrument(app, slow_seconds = None):
+    #Wraps every callback registered on app from now on and serves /metrics on app.server
+    register = app.callback
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(timed(func))
+    app.callback = callback
+
+    profiler = SlowRequestProfiler(slow_seconds) if slow_seconds else None
+    server = app.server
+
+    @server.before_request
+    def startTimer():
+        if flask.request.path.endswith('/_dash-update-component'):
+            current.callback = None
+            current.callback_seconds = 0.0
+            current.request_start = time.perf_counter()
+            if profiler:
+                profiler.begin()
+
+    @server.after_request
+    def recordRequest(response):
+        start = getattr(current, 'request_start', None)
+        if start is None or not flask.request.path.endswith('/_dash-update-component'):
+            return response
+        current.request_start = None
+        #No callback runs for responses answered from the response cache
+        callback = current.callback or ('cached' if response.headers.get('X-Cache') == 'hit' else 'unknown')
+        elapsed = time.perf_counter() - start
+        #Whatever the request spent outside the callback is dash encoding the response
+        registry.observe('dash_callback_phase_seconds', {'callback': callback, 'phase': 'serialize'},
+                         max(0.0, elapsed - current.callback_seconds))
+        registry.observe('dash_callback_response_bytes', {'callback': callback},
+                         response.calculate_content_length() or 0, size_buckets)
+        if profiler:
+            profiler.end(callback, elapsed)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return flask.Response(registry.render(), mimetype = 'text/plain; version=0.0.4')
@@ -0,0 +1,132 @@
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+#Rows written per executemany while building the SQLite file
+batch_rows = 50000
+
+def dayNumber(date, default):
+    #Days since the epoch of an ISO date, default for an open end of the range
+    return default if date is None else int(np.datetime64(date, 'D').astype(np.int64))
+
+class PandasSeries:
+    #Country series sliced out of the snapshot's frame, which stays in memory
+    def __init__(self, data, index):
+        self.data = data
+        self.index = index
+        self.columns = [col for col in data.columns if col not in ('location', 'date')]
+
+    def country(self, country, columns, start_date = None, end_date = None):
+        #location, date and columns of the rows of country between the dates, both included
+        positions = [self.data.columns.get_loc(col) for col in ['location', 'date'] + list(columns)]
+        return self.data.iloc[self.index.rows(country, start_date, end_date), positions]
+
+    def frame(self):
+        return self.data
+
+class SqliteSeries:
+    #Country series read from an SQLite file of the snapshot's frame, clustered on (location, day),
+    #so a query is one range scan of the pages of that country and only the rows asked for are held
+    #in the process. The file is the only copy of the frame a snapshot on this backend keeps, it is
+    #built once per dataset version and read by every worker through the OS page cache.
+    def __init__(self, data, path):
+        self.path = path
+        self.names = list(data.columns)
+        self.columns = [col for col in data.columns if data[col].dtype.kind in 'iuf']
+        self.text_columns = [col for col in data.columns if isinstance(data[col].dtype, pd.CategoricalDtype)
+                             and col != 'location']
+        self.dtypes = {col: data[col].dtype for col in data.columns}
+        self.local = threading.local()
+        if not os.path.exists(path):
+            self.build(data)
+
+    def build(self, data):
+        start = time.perf_counter()
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        db = sqlite3.connect(tmp_path, isolation_level = None)
+        try:
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            types = ['%s TEXT' % col for col in self.text_columns]
+            types += ['%s %s' % (col, 'REAL' if data[col].dtype.kind == 'f' else 'INTEGER') for col in self.columns]
+            db.execute("CREATE TABLE series (location TEXT, day INTEGER, %s, PRIMARY KEY (location, day)) WITHOUT ROWID"
+                       % ', '.join(types))
+            insert = "INSERT INTO series VALUES (%s)" % ', '.join('?' * (len(types) + 2))
+            days = data['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+            db.execute("BEGIN")
+            #The frame is sorted by (location, date), rows go in in key order
+            for offset in range(0, len(data), batch_rows):
+                rows = slice(offset, offset + batch_rows)
+                columns = [data['location'].iloc[rows].astype(str).tolist(), days[rows].tolist()]
+                columns += [data[col].iloc[rows].astype(object).where(data[col].iloc[rows].notna(), None).tolist()
+                            for col in self.text_columns]
+                columns += [data[col].iloc[rows].tolist() for col in self.columns]
+                db.executemany(insert, zip(*columns))
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        os.replace(tmp_path, self.path)
+        log.info("wrote %s: %d rows in %.2fs, %.1fMB", self.path, len(data), time.perf_counter() - start,
+                 os.path.getsize(self.path) / 2 ** 20)
+
+    def connect(self):
+        #Read-only connection per thread and process, with a small page cache of its own
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect('file:%s?mode=ro' % self.path, uri = True, check_same_thread = False)
+            db.execute("PRAGMA cache_size = -2048")
+            db.execute("PRAGMA mmap_size = %d" % (256 * 1024 * 1024))
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+
+    def rows(self, columns, where = '', params = ()):
+        #location, date and columns of the matching rows in (location, day) order, with the frame's dtypes
+        rows = self.connect().execute("SELECT location, day, %s FROM series %s ORDER BY location, day"
+                                      % (', '.join(columns), where), params).fetchall()
+        values = list(zip(*rows)) if rows else [()] * (len(columns) + 2)
+        frame = {'location': pd.Categorical(values[0], dtype = self.dtypes['location']),
+                 'date': np.array(values[1], dtype = np.int64).astype('datetime64[D]').astype(self.dtypes['date'])}
+        for col, column in zip(columns, values[2:]):
+            if col in self.text_columns:
+                frame[col] = pd.Categorical(column, dtype = self.dtypes[col])
+            else:
+                frame[col] = np.array(column, dtype = float).astype(self.dtypes[col])
+        return pd.DataFrame(frame)
+
+    def country(self, country, columns, start_date = None, end_date = None):
+        #Same frame as PandasSeries.country, apart from its index
+        unknown = [col for col in columns if col not in self.columns]
+        if unknown:
+            raise KeyError(unknown)
+        return self.rows(list(columns), "WHERE location = ? AND day BETWEEN ? AND ?",
+                         (country, dayNumber(start_date, -2 ** 62), dayNumber(end_date, 2 ** 62)))
+
+    def frame(self):
+        #The whole frame read back from the file, only while a delta is merged into it
+        frame = self.rows(self.text_columns + self.columns)
+        return frame[self.names]
+
+def seriesPath(directory, version):
+    return os.path.join(directory, 'series-%s.sqlite' % version[:16])
+
+def seriesVersions(directory):
+    #Version prefixes of the SQLite files in directory
+    return [os.path.basename(path)[len('series-'):-len('.sqlite')]
+            for path in glob.glob(os.path.join(directory, 'series-*.sqlite'))]
+
+def removeSeries(directory, version):
+    #The SQLite file of version and its lock, connections other workers still hold on it keep working
+    path = seriesPath(directory, version)
+    for name in (path, path + '.lock'):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
@@ -0,0 +1,139 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+#Hits only move an entry up the eviction order when its last use is older than this, so
+#reads from many workers do not all queue up for the write lock
+touch_seconds = 60
+
+def sourceHash(directory):
+    #Changes with any .py file of directory, a namespace for entries drawn by that code
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+class SqliteStore:
+    #Figure JSON by (dataset version, key) in one SQLite file shared by every process on the host.
+    #namespace tells apart entries of different code, e.g. before and after a deploy.
+    def __init__(self, path, max_bytes = 256 * 1024 * 1024, namespace = ''):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.local = threading.local()
+        db = self.connect()
+        db.execute("CREATE TABLE IF NOT EXISTS figures (version TEXT, key TEXT, value TEXT, size INTEGER, "
+                   "used REAL, PRIMARY KEY (version, key))")
+        db.execute("CREATE INDEX IF NOT EXISTS figures_used ON figures (used)")
+
+    def connect(self):
+        #One connection per thread and process, sqlite connections must not cross a fork
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout = 10, isolation_level = None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+
+    def version(self, version):
+        return self.namespace + ':' + version
+
+    def ours(self):
+        #WHERE clause and arguments matching the entries of this namespace only, so workers of
+        #another deploy sharing the file keep theirs
+        prefix = self.namespace + ':'
+        return "substr(version, 1, ?) = ?", (len(prefix), prefix)
+
+    def guarded(self, action, *args):
+        #A busy or broken store only costs hits, callers carry on as if it were empty
+        try:
+            return action(*args)
+        except sqlite3.Error as e:
+            log.warning("figure store %s: %s", self.path, e)
+            return None
+
+    def get(self, version, key):
+        return self.guarded(self.read, version, key)
+
+    def read(self, version, key):
+        db = self.connect()
+        row = db.execute("SELECT value, used FROM figures WHERE version = ? AND key = ?",
+                         (self.version(version), json.dumps(key))).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now - touch_seconds:
+            db.execute("UPDATE figures SET used = ? WHERE version = ? AND key = ?",
+                       (now, self.version(version), json.dumps(key)))
+        return row[0]
+
+    def put(self, version, key, figure_json):
+        if len(figure_json) <= self.max_bytes:
+            self.guarded(self.write, version, key, figure_json)
+
+    def write(self, version, key, figure_json):
+        size = len(figure_json)
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO figures VALUES (?, ?, ?, ?, ?)",
+                       (self.version(version), json.dumps(key), figure_json, size, time.time()))
+            total = db.execute("SELECT SUM(size) FROM figures").fetchone()[0]
+            if total > self.max_bytes:
+                #Oldest uses first, until the entries fit again
+                evict, freed = [], 0
+                for rowid, entry_size in db.execute("SELECT rowid, size FROM figures ORDER BY used"):
+                    if total - freed <= self.max_bytes:
+                        break
+                    evict.append((rowid,))
+                    freed += entry_size
+                db.executemany("DELETE FROM figures WHERE rowid = ?", evict)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def reset(self, version):
+        #Drops the entries of every other version, a worker still serving an older one only loses its hits
+        where, args = self.ours()
+        self.guarded(lambda: self.connect().execute("DELETE FROM figures WHERE %s AND version != ?" % where,
+                                                    args + (self.version(version),)))
+
+    def rebase(self, old_version, version, keep):
+        self.guarded(self.copy, old_version, version, keep)
+
+    def copy(self, old_version, version, keep):
+        #Copies the entries of old_version whose key passes keep() over to version
+        db = self.connect()
+        rows = db.execute("SELECT key, value, size, used FROM figures WHERE version = ?",
+                          (self.version(old_version),)).fetchall()
+        kept = [(self.version(version), key, value, size, used) for key, value, size, used in rows
+                if keep(tuple(json.loads(key)))]
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR IGNORE INTO figures VALUES (?, ?, ?, ?, ?)", kept)
+            where, args = self.ours()
+            db.execute("DELETE FROM figures WHERE %s AND version NOT IN (?, ?)" % where,
+                       args + (self.version(old_version), self.version(version)))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self.guarded(lambda: self.connect().execute("DELETE FROM figures"))
+
+    def stats(self):
+        row = self.guarded(lambda: self.connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures").fetchone())
+        count, size = row or (0, 0)
+        return {'shared_entries': count, 'shared_bytes': size}
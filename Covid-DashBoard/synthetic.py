@@ -0,0 +1,84 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+#Header of the OWID covid export data.csv is taken from, loader.usecols index into it
+columns = ['iso_code', 'continent', 'location', 'date', 'total_cases', 'new_cases',
+           'new_cases_smoothed', 'total_deaths', 'new_deaths', 'new_deaths_smoothed',
+           'total_cases_per_million', 'new_cases_per_million', 'new_cases_smoothed_per_million',
+           'total_deaths_per_million', 'new_deaths_per_million', 'new_deaths_smoothed_per_million',
+           'reproduction_rate', 'icu_patients', 'icu_patients_per_million', 'hosp_patients',
+           'hosp_patients_per_million', 'weekly_icu_admissions', 'weekly_icu_admissions_per_million',
+           'weekly_hosp_admissions', 'weekly_hosp_admissions_per_million', 'total_tests', 'new_tests',
+           'total_tests_per_thousand', 'new_tests_per_thousand', 'new_tests_smoothed',
+           'new_tests_smoothed_per_thousand', 'tests_per_case', 'positive_rate', 'tests_units',
+           'stringency_index', 'population', 'population_density', 'median_age', 'aged_65_older',
+           'aged_70_older', 'gdp_per_capita', 'extreme_poverty', 'cardiovasc_death_rate',
+           'diabetes_prevalence', 'female_smokers', 'male_smokers', 'handwashing_facilities',
+           'hospital_beds_per_thousand', 'life_expectancy', 'human_development_index']
+
+continents = ['Africa', 'Asia', 'Europe', 'North America', 'Oceania', 'South America']
+
+def isoCode(i):
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26]
+
+def countryFrame(rng, iso_code, continent, location, dates):
+    days = len(dates)
+    population = float(rng.integers(10 ** 5, 10 ** 9))
+    #Epidemic waves as a few gaussian bumps over the period
+    t = np.arange(days)
+    rate = sum(rng.uniform(0.2, 5) * np.exp(-((t - rng.uniform(0, days)) / rng.uniform(5, days / 4 + 5)) ** 2)
+               for _ in range(3))
+    new_cases = rng.poisson(rate * population / 1e5).astype(float)
+    new_deaths = rng.binomial(new_cases.astype(np.int64), 0.02).astype(float)
+
+    #Countries start reporting at different days, before that the case columns are empty
+    first = int(rng.integers(0, max(1, days // 5)))
+    new_cases[:first] = np.nan
+    new_deaths[:first] = np.nan
+    total_cases = np.nancumsum(new_cases)
+    total_deaths = np.nancumsum(new_deaths)
+    total_cases[:first] = np.nan
+    total_deaths[:first] = np.nan
+
+    frame = pd.DataFrame(index = range(days), columns = columns, dtype = float)
+    frame['iso_code'] = iso_code
+    frame['continent'] = continent
+    frame['location'] = location
+    frame['date'] = dates.strftime('%Y-%m-%d')
+    frame['total_cases'] = total_cases
+    frame['new_cases'] = new_cases
+    frame['total_deaths'] = total_deaths
+    frame['new_deaths'] = new_deaths
+    frame['total_cases_per_million'] = total_cases / population * 1e6
+    frame['new_cases_per_million'] = new_cases / population * 1e6
+    frame['total_deaths_per_million'] = total_deaths / population * 1e6
+    frame['new_deaths_per_million'] = new_deaths / population * 1e6
+    frame['stringency_index'] = rng.uniform(0, 100, days).round(2)
+    frame['population'] = population
+    frame['hospital_beds_per_thousand'] = round(rng.uniform(0.5, 10), 3)
+    frame['tests_units'] = 'tests performed'
+    return frame
+
+def generate(path, countries = 200, days = 300, end = '2020-11-02', seed = 0):
+    #Writes a data.csv lookalike, including the continent/World aggregate rows the loader drops
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end = end, periods = days, freq = 'D')
+    frames = [countryFrame(rng, isoCode(i), continents[i % len(continents)], "Country %04d" % i, dates)
+              for i in range(countries)]
+    frames += [countryFrame(rng, 'OWID_' + name[:3].upper(), None, name, dates)
+               for name in ['World'] + continents]
+    data = pd.concat(frames, ignore_index = True)
+    data.sort_values(['iso_code', 'date'], kind = 'mergesort').to_csv(path, index = False)
+    return len(data)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Write a synthetic data.csv with the OWID schema')
+    parser.add_argument('path', nargs = '?', default = 'data.csv')
+    parser.add_argument('--countries', type = int, default = 200)
+    parser.add_argument('--days', type = int, default = 300)
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+    print("wrote %d rows to %s" % (generate(args.path, args.countries, args.days, seed = args.seed), args.path))
@@ -0,0 +1,87 @@
+import math
+import re
+
+import numpy as np
+
+#filter_query operators of dash_table, symbols by their word. Symbols are tried longest first so
+#'>=' is not read as '>', words must end there so 'ne' is not read out of 'nexus'.
+operators = {'>=': 'ge', '<=': 'le', '!=': 'ne', '<': 'lt', '>': 'gt', '=': 'eq'}
+words = ['ge', 'le', 'lt', 'gt', 'ne', 'eq', 'contains', 'datestartswith']
+operator_token = re.compile(r'[si]?(>=|<=|!=|<|>|=|(?:%s)(?![A-Za-z]))' % '|'.join(words))
+
+#Operators comparing the value as text, a number typed into them is still text
+text_operators = ('contains', 'datestartswith')
+
+def splitFilterPart(filter_part):
+    #'{column} operator value'. The operator is the token right after the closing brace, with the
+    #s (case sensitive) or i (insensitive) prefix dash_table may put in front of it.
+    filter_part = filter_part.strip()
+    if not filter_part.startswith('{') or '}' not in filter_part:
+        return [None] * 3
+    name, rest = filter_part[1:].split('}', 1)
+    rest = rest.lstrip()
+    match = operator_token.match(rest)
+    if match is None:
+        return [None] * 3
+    operator = operators.get(match.group(1), match.group(1))
+
+    value_part = rest[match.end():].strip()
+    v0 = value_part[:1]
+    if len(value_part) > 1 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+        value = value_part[1: -1].replace('\\' + v0, v0)
+    elif operator in text_operators:
+        value = value_part
+    else:
+        try:
+            value = float(value_part)
+        except ValueError:
+            value = value_part
+
+    return name, operator, value
+
+def filterMask(x, filter_query):
+    mask = np.ones(len(x), dtype = bool)
+    for filter_part in (filter_query or '').split(' && '):
+        name, operator, value = splitFilterPart(filter_part)
+        if name not in x.columns:
+            continue
+        col = x[name]
+        try:
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                mask &= getattr(col, operator)(value).to_numpy()
+            elif operator == 'contains':
+                mask &= col.astype(str).str.contains(str(value), case = False, regex = False).to_numpy()
+            elif operator == 'datestartswith':
+                mask &= col.astype(str).str.startswith(str(value)).to_numpy()
+        except TypeError:
+            #Text typed into a number column matches nothing
+            mask[:] = False
+    return mask
+
+def sortOrders(x):
+    #Row orders of x for every column and direction, built once per snapshot
+    orders = {}
+    for col in x.columns:
+        values = x[col].to_numpy()
+        if values.dtype.kind in 'iuf':
+            #Compacted counts are ints, negated as floats so unsigned and extreme values sort too
+            values = values.astype(float)
+            orders[col, 'asc'] = np.argsort(values, kind = 'stable')
+            orders[col, 'desc'] = np.argsort(-values, kind = 'stable')
+        else:
+            orders[col, 'asc'] = np.argsort(values.astype(str), kind = 'stable')
+            orders[col, 'desc'] = orders[col, 'asc'][::-1]
+    return orders
+
+def pageRecords(x, orders, page_current, page_size, sort_by, filter_query):
+    #One page of x as table records keyed by country, plus the page count after filtering
+    order = np.arange(len(x))
+    if sort_by:
+        order = orders[sort_by[0]['column_id'], sort_by[0]['direction']]
+    order = order[filterMask(x, filter_query)[order]]
+
+    page = order[page_current * page_size:(page_current + 1) * page_size]
+    records = x.iloc[page].to_dict('records')
+    for record in records:
+        record['id'] = record['Country']
+    return records, max(1, math.ceil(len(order) / page_size))
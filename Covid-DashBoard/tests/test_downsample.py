@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample, lttb
+
+def series(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n) * 86400.0, rng.normal(size = n).cumsum()
+
+@pytest.mark.parametrize('n', [3, 4, 10, 101, 1000])
+@pytest.mark.parametrize('threshold', [3, 4, 7, 50, 999])
+def test_keeps_ends_in_order(n, threshold):
+    x, y = series(n)
+    keep = lttb(x, y, threshold)
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+    assert len(keep) == min(n, threshold)
+
+def test_spike_survives():
+    x = np.arange(500, dtype = float)
+    y = np.zeros(500)
+    y[137] = 1000
+    y[402] = -1000
+    keep = lttb(x, y, 20)
+    assert 137 in keep and 402 in keep
+
+@pytest.mark.parametrize('n, threshold', [(0, 10), (1, 10), (2, 10), (2, 2), (10, 10), (10, 11), (10, 2), (10, 0)])
+def test_everything_kept_when_nothing_to_drop(n, threshold):
+    x, y = series(n)
+    assert lttb(x, y, threshold).tolist() == list(range(n))
+
+def test_every_size_up_to_the_threshold():
+    for n in range(30):
+        x, y = series(n, seed = n)
+        for threshold in range(35):
+            keep = lttb(x, y, threshold)
+            assert (np.diff(keep) > 0).all()
+            assert len(keep) == (n if threshold >= n or threshold < 3 else threshold)
+            if n:
+                assert keep[0] == 0 and keep[-1] == n - 1
+
+def test_downsample_drops_missing_values():
+    dates = pd.date_range('2020-03-01', periods = 200, freq = 'D')
+    values = np.sin(np.arange(200) / 10.0) * 100
+    values[[0, 50, 199]] = np.nan
+    frame = pd.DataFrame({'date': dates, 'new_cases': values})
+    kept = downsample(frame, 'new_cases', 40)
+    assert len(kept) == 40
+    assert np.isfinite(kept['new_cases']).all()
+    assert kept['date'].iloc[0] == dates[1] and kept['date'].iloc[-1] == dates[198]
+    assert kept['date'].is_monotonic_increasing
+
+    short = downsample(frame.iloc[:10], 'new_cases', 40)
+    assert short['date'].tolist() == dates[1:10].tolist()
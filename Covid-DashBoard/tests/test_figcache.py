@@ -0,0 +1,102 @@
+import json
+
+from figcache import FigureCache
+from sharedcache import SqliteStore
+
+def figure(name, points = 1):
+    return {'data': [{'name': name, 'y': list(range(points))}], 'layout': {}}
+
+class Builds:
+    #Builder of figure(name) that counts how often every name was built
+    def __init__(self):
+        self.count = {}
+
+    def __call__(self, name, points = 1):
+        def build():
+            self.count[name] = self.count.get(name, 0) + 1
+            return figure(name, points)
+        return build
+
+def size(name, points = 1):
+    return len(json.dumps(figure(name, points), separators = (',', ':')))
+
+def test_hits_and_misses():
+    cache, builds = FigureCache(), Builds()
+    cache.reset('v1')
+    assert cache.get('v1', ('A',), builds('A')) == figure('A')
+    assert cache.get('v1', ('A',), builds('A')) == figure('A')
+    assert builds.count == {'A': 1}
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_least_recently_used_goes_first():
+    cache, builds = FigureCache(max_entries = 2), Builds()
+    cache.reset('v1')
+    cache.get('v1', ('A',), builds('A'))
+    cache.get('v1', ('B',), builds('B'))
+    cache.get('v1', ('A',), builds('A'))
+    cache.get('v1', ('C',), builds('C'))
+    assert [key for version, key in cache.entries] == [('A',), ('C',)]
+    cache.get('v1', ('B',), builds('B'))
+    assert builds.count == {'A': 1, 'B': 2, 'C': 1}
+
+def test_byte_limit():
+    limit = size('A', 50) + size('B', 50)
+    cache, builds = FigureCache(max_bytes = limit), Builds()
+    cache.reset('v1')
+    cache.get('v1', ('A',), builds('A', 50))
+    cache.get('v1', ('B',), builds('B', 50))
+    assert cache.stats()['bytes'] == limit
+    cache.get('v1', ('C',), builds('C', 50))
+    assert [key for version, key in cache.entries] == [('B',), ('C',)]
+    assert cache.stats()['bytes'] <= limit
+
+    #A figure bigger than the whole cache is served but not kept
+    assert cache.get('v1', ('D',), builds('D', 500)) == figure('D', 500)
+    assert [key for version, key in cache.entries] == [('B',), ('C',)]
+
+def test_reset_drops_other_versions():
+    cache, builds = FigureCache(), Builds()
+    cache.reset('v1')
+    cache.get('v1', ('A',), builds('A'))
+    cache.reset('v1')
+    assert cache.stats()['entries'] == 1
+    cache.reset('v2')
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+    cache.get('v2', ('A',), builds('A'))
+    assert builds.count == {'A': 2}
+
+def test_rebase_keeps_what_keep_accepts():
+    cache, builds = FigureCache(), Builds()
+    cache.reset('v1')
+    for name in 'ABC':
+        cache.get('v1', (name,), builds(name))
+    cache.rebase('v2', lambda key: key[0] != 'B')
+    assert sorted(key for version, key in cache.entries) == [('A',), ('C',)]
+    assert cache.stats()['bytes'] == size('A') + size('C')
+    for name in 'ABC':
+        cache.get('v2', (name,), builds(name))
+    assert builds.count == {'A': 1, 'B': 2, 'C': 1}
+
+def test_figures_of_an_old_version_are_never_stored(tmp_path):
+    store = SqliteStore(str(tmp_path / 'figures.sqlite'), namespace = 'test')
+    cache, builds = FigureCache(store = store), Builds()
+    cache.reset('v1')
+    cache.reset('v2')
+    #A callback still running against v1 gets its figure, but neither cache keeps it
+    assert cache.get('v1', ('A',), builds('A')) == figure('A')
+    assert cache.stats()['entries'] == 0
+    assert store.get('v1', ('A',)) is None
+    cache.get('v1', ('A',), builds('A'))
+    assert builds.count == {'A': 2}
+
+def test_workers_share_figures_through_the_store(tmp_path):
+    path = str(tmp_path / 'figures.sqlite')
+    first = FigureCache(store = SqliteStore(path, namespace = 'test'))
+    second = FigureCache(store = SqliteStore(path, namespace = 'test'))
+    builds = Builds()
+    first.reset('v1')
+    second.reset('v1')
+    first.get('v1', ('A',), builds('A'))
+    assert second.get('v1', ('A',), builds('A')) == figure('A')
+    assert builds.count == {'A': 1}
+    assert second.stats()['shared_hits'] == 1
@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+import pytest
+from dash.dependencies import Input, Output
+
+import httpcache
+
+@pytest.fixture
+def served():
+    #A one-callback app whose answer is as long as its input asks, behind a dataset version that can be swapped
+    app = dash.Dash(__name__)
+    app.layout = html.Div([dcc.Input(id = 'length', value = 10), html.Div(id = 'text')])
+    calls = []
+
+    @app.callback(Output('text', 'children'), [Input('length', 'value')])
+    def text(length):
+        calls.append(length)
+        return 'x' * int(length)
+
+    state = {'version': 'v1'}
+    cache = httpcache.ResponseCache()
+    def version():
+        cache.reset(state['version'])
+        return state['version']
+    httpcache.install(app, version, cache)
+    return app.server.test_client(), state, calls
+
+def update(client, length, headers = None):
+    body = {'output': 'text.children', 'outputs': {'id': 'text', 'property': 'children'},
+            'inputs': [{'id': 'length', 'property': 'value', 'value': length}], 'changedPropIds': ['length.value']}
+    return client.post('/_dash-update-component', data = json.dumps(body), content_type = 'application/json',
+                       headers = headers or {})
+
+def test_repeated_request_is_a_hit(served):
+    client, state, calls = served
+    first = update(client, 10)
+    assert first.status_code == 200 and 'X-Cache' not in first.headers
+    again = update(client, 10)
+    assert again.status_code == 200 and again.headers['X-Cache'] == 'hit'
+    assert again.get_data() == first.get_data()
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert calls == [10]
+    #Another input is another response
+    assert update(client, 20).headers['ETag'] != first.headers['ETag']
+
+def test_matching_tag_is_not_modified(served):
+    client, state, calls = served
+    tag = update(client, 10).headers['ETag']
+    response = update(client, 10, {'If-None-Match': tag})
+    assert response.status_code == 304 and response.get_data() == b''
+    assert response.headers['ETag'] == tag
+    assert update(client, 10, {'If-None-Match': '"stale"'}).status_code == 200
+
+def test_large_bodies_are_compressed(served):
+    client, state, calls = served
+    small = update(client, 10, {'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    large = update(client, 2000, {'Accept-Encoding': 'gzip'})
+    assert large.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in large.headers['Vary']
+    body = gzip.decompress(large.get_data())
+    assert len(body) >= httpcache.min_compress_bytes
+    assert update(client, 2000).get_data() == body
+    #The cached response goes out compressed the same way
+    again = update(client, 2000, {'Accept-Encoding': 'gzip'})
+    assert again.headers['X-Cache'] == 'hit' and again.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(again.get_data()) == body
+
+def test_dataset_swap_changes_the_tag(served):
+    client, state, calls = served
+    tag = update(client, 10).headers['ETag']
+    state['version'] = 'v2'
+    response = update(client, 10, {'If-None-Match': tag})
+    assert response.status_code == 200 and 'X-Cache' not in response.headers
+    assert response.headers['ETag'] != tag
+    assert calls == [10, 10]
+
+def test_layout_is_tagged(served):
+    client, state, calls = served
+    tag = client.get('/_dash-layout').headers['ETag']
+    assert client.get('/_dash-layout', headers = {'If-None-Match': tag}).status_code == 304
@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import loader
+import synthetic
+
+#Splits of a synthetic export into data.csv and a delta, by (frame, dates) -> rows of the delta
+splits = {
+    'last day': lambda full, dates: dates == dates.max(),
+    'last three days': lambda full, dates: dates >= dates.max() - pd.Timedelta(days = 2),
+    'two countries': lambda full, dates: (dates == dates.max()) & full['location'].isin(['Country 0003', 'Country 0010']),
+    'new country': lambda full, dates: full['location'] == 'Country 0005',
+    'backfill': lambda full, dates: (full['location'] == 'Country 0007') & (dates < dates.min() + pd.Timedelta(days = 20)),
+    'gap': lambda full, dates: dates == dates.min() + pd.Timedelta(days = 30),
+}
+
+@pytest.fixture(scope = 'module')
+def export(tmp_path_factory):
+    path = tmp_path_factory.mktemp('export') / 'full.csv'
+    synthetic.generate(str(path), countries = 20, days = 60)
+    full = pd.read_csv(path)
+    return path, full, pd.to_datetime(full['date'])
+
+def assertSameFrame(a, b):
+    assert list(a.columns) == list(b.columns)
+    for col in a.columns:
+        if a[col].dtype.kind in 'iuf':
+            #The split files are written from pandas' parse of the export, which can be a last bit off pyarrow's
+            np.testing.assert_allclose(a[col].to_numpy(dtype = float), b[col].to_numpy(dtype = float),
+                                       rtol = 1e-12, err_msg = col)
+        else:
+            assert (a[col].astype(str).to_numpy() == b[col].astype(str).to_numpy()).all(), col
+
+@pytest.mark.parametrize('backend', ['pandas', 'sqlite'])
+@pytest.mark.parametrize('split', list(splits))
+def test_ingest_matches_full_rebuild(export, tmp_path, split, backend):
+    path, full, dates = export
+    delta = splits[split](full, dates)
+    full[~delta].to_csv(tmp_path / 'data.csv', index = False)
+    full[delta].to_csv(tmp_path / 'delta.csv', index = False)
+
+    series_dir = str(tmp_path) if backend == 'sqlite' else None
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'), series_dir = series_dir)
+    changed = dataset.ingest(str(tmp_path / 'delta.csv'))
+    ingested = dataset.current()
+    rebuilt = loader.Snapshot(*loader.loadData(str(path), cache_path = str(tmp_path / 'full.feather')))
+
+    assert changed
+    if split == 'two countries':
+        assert changed == {'Country 0003', 'Country 0010'}
+    assert (ingested.data is None) == (backend == 'sqlite')
+    assertSameFrame(ingested.frame(), rebuilt.data)
+    assertSameFrame(ingested.x, rebuilt.x)
+    assertSameFrame(ingested.df_pop.reset_index(), rebuilt.df_pop.reset_index())
+    assert ingested.as_of == rebuilt.as_of
+
+    daily, expected = ingested.daily, rebuilt.daily
+    assert (daily.dates == expected.dates).all()
+    assert list(daily.countries) == list(expected.countries)
+    assert daily.iso_codes == expected.iso_codes
+    assert set(daily.values) == set(expected.values)
+    for name in expected.values:
+        np.testing.assert_allclose(daily.values[name], expected.values[name], rtol = 1e-12, err_msg = name)
+    for name in expected.world:
+        np.testing.assert_allclose(daily.world[name], expected.world[name], rtol = 1e-12, err_msg = name)
+
+    #The rows are loaded now, ingesting the file again changes nothing
+    assert dataset.ingest(str(tmp_path / 'delta.csv')) == set()
+    assert dataset.current() is ingested
+
+def fromMap(values):
+    #Arrays read out of a feather map end in an arrow buffer, not in memory numpy allocated
+    while isinstance(values, np.ndarray) and values.base is not None:
+        values = values.base
+    return not isinstance(values, np.ndarray)
+
+@pytest.fixture
+def deltas(export, tmp_path):
+    #data.csv without the last two days, and a delta file of each of them
+    path, full, dates = export
+    last = dates.max()
+    full[dates < last - pd.Timedelta(days = 1)].to_csv(tmp_path / 'data.csv', index = False)
+    (tmp_path / 'deltas').mkdir()
+    files = []
+    for day in (last - pd.Timedelta(days = 1), last):
+        delta = tmp_path / ('%s.csv' % day.date())
+        full[dates == day].to_csv(delta, index = False)
+        files.append(delta)
+    return tmp_path, files
+
+def publish(source, target):
+    os.replace(str(source), str(target))
+
+def test_ingested_frame_is_mapped(deltas):
+    tmp_path, files = deltas
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'))
+    assert dataset.ingest(str(files[0]))
+    data = dataset.current().data
+    assert all(fromMap(data[col].to_numpy()) for col in data.columns if data[col].dtype.kind in 'iuf')
+    meta = loader.readCacheMeta(str(tmp_path / 'data.csv.delta.feather'))
+    assert meta['version'] == dataset.current().version
+
+def test_truncated_delta_is_not_applied(deltas):
+    tmp_path, files = deltas
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'))
+    before = dataset.current()
+    content = files[0].read_bytes()
+    files[0].write_bytes(content[:len(content) // 2])
+    with pytest.raises(pa.ArrowInvalid):
+        dataset.ingest(str(files[0]))
+    assert dataset.current() is before
+
+def test_ingest_new_waits_for_complete_files(deltas):
+    tmp_path, files = deltas
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'), delta_dir = str(tmp_path / 'deltas'), delta_settle = 3600)
+    loaded = dataset.current()
+
+    #Temporary and hidden names are never read, a new file waits for a poll where it did not change
+    content = files[0].read_bytes()
+    (tmp_path / 'deltas' / 'first.csv.tmp').write_bytes(content)
+    (tmp_path / 'deltas' / '.first.csv').write_bytes(content)
+    (tmp_path / 'deltas' / 'first.csv').write_bytes(content[:len(content) // 2])
+    assert dataset.ingestNew() is False
+    (tmp_path / 'deltas' / 'first.csv').write_bytes(content)
+    assert dataset.ingestNew() is False
+    assert dataset.current() is loaded
+    assert dataset.ingestNew() is True
+    first = dataset.current()
+    assert first.as_of == pd.Timestamp(pd.read_csv(files[0])['date'].max())
+    assert dataset.ingestNew() is False
+
+    #A file published again with other contents is ingested again
+    both = pd.concat([pd.read_csv(files[0]), pd.read_csv(files[1])])
+    both.to_csv(tmp_path / 'both.csv', index = False)
+    publish(tmp_path / 'both.csv', tmp_path / 'deltas' / 'first.csv')
+    assert dataset.ingestNew() is False
+    assert dataset.ingestNew() is True
+    assert dataset.current().as_of == pd.Timestamp(pd.read_csv(files[1])['date'].max())
+
+def test_settled_files_are_ingested_on_load(deltas):
+    tmp_path, files = deltas
+    publish(files[0], tmp_path / 'deltas' / files[0].name)
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'), delta_dir = str(tmp_path / 'deltas'), delta_settle = 0)
+    assert dataset.current().as_of == pd.Timestamp(pd.read_csv(tmp_path / 'deltas' / files[0].name)['date'].max())
@@ -0,0 +1,117 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import loader
+import synthetic
+
+@pytest.fixture(scope = 'module')
+def snapshot(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'data.csv'
+    synthetic.generate(str(path), countries = 5, days = 30)
+    return loader.Snapshot(*loader.loadData(str(path)))
+
+@pytest.mark.parametrize('date', [None, pd.NaT, '', 'NaT'])
+def test_row_of_no_date_is_none(snapshot, date):
+    assert snapshot.daily.row(date) is None
+
+def test_row_of_a_day(snapshot):
+    daily = snapshot.daily
+    assert daily.row(snapshot.as_of) == len(daily.dates) - 1
+    assert daily.row(str(pd.Timestamp(daily.dates[0]).date()) + 'T12:00:00') == 0
+    assert daily.row(pd.Timestamp(daily.dates[0]) - pd.Timedelta(days = 1)) is None
+
+def test_one_process_parses_a_changed_csv(tmp_path, monkeypatch):
+    path = tmp_path / 'data.csv'
+    synthetic.generate(str(path), countries = 5, days = 30)
+    parses = tmp_path / 'parses'
+    read = loader.readArrowCsv
+    def countedRead(csv_path):
+        with open(parses, 'a') as f:
+            f.write('%d\n' % os.getpid())
+        time.sleep(0.5)
+        return read(csv_path)
+    monkeypatch.setattr(loader, 'readArrowCsv', countedRead)
+
+    #Workers forked together all find the cache stale at once
+    pids = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                data, digest = loader.loadData(str(path))
+                os._exit(0 if len(data) and digest == loader.fileHash(str(path)) else 1)
+            except BaseException:
+                os._exit(1)
+        pids.append(pid)
+    assert all(os.waitpid(pid, 0)[1] == 0 for pid in pids)
+    assert len(parses.read_text().split()) == 1
+
+def reports(days = 120, countries = 8, seed = 1):
+    #Daily counts of a few countries, with a late start, gaps of one and of many days and a zero run
+    rng = np.random.default_rng(seed)
+    new = rng.poisson(50, (days, countries)).astype(float)
+    new[:15, 0] = np.nan
+    new[rng.random((days, countries)) < 0.1] = np.nan
+    new[40:60, 1] = np.nan
+    new[70:90, 2] = 0
+    totals = np.nancumsum(new, axis = 0)
+    totals[np.isnan(new)] = np.nan
+    totals[:15, 0] = np.nan
+    return new, totals
+
+@pytest.mark.parametrize('window', [1, 7, 14, 200])
+def test_rolling_mean_matches_pandas(window):
+    new, totals = reports()
+    expected = pd.DataFrame(new).rolling(window, min_periods = 1).mean().to_numpy()
+    np.testing.assert_allclose(loader.rollingMean(new, window), expected, rtol = 1e-9)
+
+def test_growth_rate_matches_pandas():
+    new, totals = reports()
+    filled = loader.ffill(totals)
+    expected = (pd.DataFrame(filled).pct_change() * 100).replace([np.inf, -np.inf], np.nan).to_numpy()
+    np.testing.assert_allclose(loader.growthRate(filled), expected, rtol = 1e-9)
+    #Unfilled gaps have no growth on either side of them
+    assert np.isnan(loader.growthRate(totals)[np.isnan(totals)]).all()
+
+@pytest.mark.parametrize('window', [1, 7])
+def test_doubling_time_matches_log_ratio(window):
+    new, totals = reports()
+    filled = loader.ffill(totals)
+    frame = pd.DataFrame(filled)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        expected = (window * np.log(2) / np.log(frame / frame.shift(window))).to_numpy(copy = True)
+    expected[~np.isfinite(expected) | (expected <= 0)] = np.nan
+    np.testing.assert_allclose(loader.doublingTime(filled, window), expected, rtol = 1e-9)
+    #A total that stood still over the window never doubles
+    assert np.isnan(loader.doublingTime(filled, window)[70 + window:90, 2]).all()
+
+def test_ffill_carries_over_gaps():
+    new, totals = reports()
+    np.testing.assert_array_equal(loader.ffill(totals), pd.DataFrame(totals).ffill().to_numpy())
+
+def test_daily_table_over_missing_days(tmp_path):
+    #Countries that skip days leave holes in the shared date axis, the derived matrices see them
+    path = tmp_path / 'data.csv'
+    synthetic.generate(str(path), countries = 4, days = 40)
+    frame = pd.read_csv(path)
+    skip = (frame['location'] == 'Country 0001') & frame['date'].isin(['2020-10-10', '2020-10-11', '2020-10-20'])
+    frame[~skip].to_csv(path, index = False)
+    snapshot = loader.Snapshot(*loader.loadData(str(path)))
+    data, daily = snapshot.data, snapshot.daily
+
+    frame = data.assign(location = data['location'].astype(str))
+    new = frame.pivot(index = 'date', columns = 'location', values = 'new_cases')[daily.countries]
+    totals = frame.pivot(index = 'date', columns = 'location', values = 'total_cases')[daily.countries].ffill()
+    assert len(new) == len(daily.dates)
+    assert new['Country 0001'].isna().sum() > new['Country 0000'].isna().sum()
+    np.testing.assert_allclose(daily.values['new_cases_avg7'], new.rolling(7, min_periods = 1).mean().to_numpy(),
+                               rtol = 1e-9)
+    growth = (totals.pct_change() * 100).replace([np.inf, -np.inf], np.nan).to_numpy()
+    np.testing.assert_allclose(daily.values['total_cases_growth'], growth, rtol = 1e-9)
+    #The skipped days carry the last total, so they show no growth
+    rows = [daily.row(day) for day in ['2020-10-10', '2020-10-11', '2020-10-20']]
+    assert (daily.values['total_cases_growth'][rows, daily.country_cols['Country 0001']] == 0).all()
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import loader
+import synthetic
+from series import seriesPath, seriesVersions
+
+@pytest.fixture(scope = 'module')
+def snapshots(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'data.csv'
+    synthetic.generate(str(path), countries = 6, days = 40)
+    data, version = loader.loadData(str(path))
+    series_dir = str(path.parent)
+    return loader.Snapshot(data, version), loader.Snapshot(data, version, series_dir = series_dir)
+
+def test_sqlite_snapshot_does_not_hold_the_frame(snapshots):
+    in_memory, on_disk = snapshots
+    assert on_disk.data is None
+    assert os.path.exists(seriesPath(on_disk.series_dir, on_disk.version))
+    assert on_disk.x.equals(in_memory.x)
+    assert on_disk.df_pop.equals(in_memory.df_pop)
+    for name in in_memory.daily.values:
+        np.testing.assert_array_equal(on_disk.daily.values[name], in_memory.daily.values[name])
+
+@pytest.mark.parametrize('start_date, end_date', [(None, None), ('2020-10-01', None), (None, '2020-10-10'),
+                                                  ('2020-10-05', '2020-10-12'), ('2021-01-01', None)])
+def test_country_series_match(snapshots, start_date, end_date):
+    in_memory, on_disk = snapshots
+    columns = ['total_cases', 'new_deaths', 'stringency_index']
+    assert set(columns) <= set(on_disk.series.columns)
+    for country in in_memory.daily.countries:
+        expected = in_memory.series.country(country, columns, start_date, end_date).reset_index(drop = True)
+        pd.testing.assert_frame_equal(on_disk.series.country(country, columns, start_date, end_date), expected)
+
+def test_frame_reads_back_the_same(snapshots):
+    in_memory, on_disk = snapshots
+    pd.testing.assert_frame_equal(on_disk.frame(), in_memory.frame())
+
+def test_unknown_column_is_an_error(snapshots):
+    in_memory, on_disk = snapshots
+    with pytest.raises(KeyError):
+        on_disk.series.country(in_memory.daily.countries[0], ['no_such_column'])
+
+def test_files_of_retired_versions_are_removed(tmp_path):
+    full = tmp_path / 'full.csv'
+    synthetic.generate(str(full), countries = 3, days = 20)
+    frame = pd.read_csv(full)
+    dates = pd.to_datetime(frame['date'])
+    days = sorted(dates.unique())
+    frame[dates < days[-3]].to_csv(tmp_path / 'data.csv', index = False)
+    series_dir = tmp_path / 'series'
+    series_dir.mkdir()
+    (series_dir / 'series-0123456789abcdef.sqlite').write_bytes(b'left by an earlier run')
+
+    dataset = loader.Dataset(str(tmp_path / 'data.csv'), series_dir = str(series_dir))
+    versions = [dataset.current().version]
+    assert seriesVersions(str(series_dir)) == [versions[0][:16]]
+    for day in days[-3:]:
+        frame[dates == day].to_csv(tmp_path / 'delta.csv', index = False)
+        dataset.ingest(str(tmp_path / 'delta.csv'))
+        versions.append(dataset.current().version)
+        #The current version and the previous one, which callbacks may still be running on
+        assert sorted(seriesVersions(str(series_dir))) == sorted(version[:16] for version in versions[-2:])
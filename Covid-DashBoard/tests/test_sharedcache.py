@@ -0,0 +1,27 @@
+from sharedcache import SqliteStore
+
+def test_reset_keeps_other_namespaces(tmp_path):
+    path = str(tmp_path / 'figures.sqlite')
+    old_code, new_code = SqliteStore(path, namespace = 'old'), SqliteStore(path, namespace = 'new')
+    old_code.put('v1', ('main',), '{"old": 1}')
+    new_code.put('v1', ('main',), '{"new": 1}')
+    new_code.put('v0', ('main',), '{"new": 0}')
+
+    new_code.reset('v1')
+    assert old_code.get('v1', ('main',)) == '{"old": 1}'
+    assert new_code.get('v1', ('main',)) == '{"new": 1}'
+    assert new_code.get('v0', ('main',)) is None
+
+def test_rebase_keeps_other_namespaces(tmp_path):
+    path = str(tmp_path / 'figures.sqlite')
+    old_code, new_code = SqliteStore(path, namespace = 'old'), SqliteStore(path, namespace = 'new')
+    old_code.put('v0', ('A',), '{"old": "A"}')
+    new_code.put('v0', ('A',), '{"new": "A"}')
+    new_code.put('v0', ('B',), '{"new": "B"}')
+
+    new_code.rebase('v0', 'v1', lambda key: key[0] == 'A')
+    new_code.rebase('v1', 'v2', lambda key: True)
+    assert old_code.get('v0', ('A',)) == '{"old": "A"}'
+    assert new_code.get('v2', ('A',)) == '{"new": "A"}'
+    assert new_code.get('v2', ('B',)) is None
+    assert new_code.get('v0', ('A',)) is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tablequery import filterMask, pageRecords, sortOrders, splitFilterPart
+
+def table():
+    return pd.DataFrame({'Country': ['A', 'B', 'C', 'D', 'E'],
+                         'Total Cases': np.array([812, 91292, 8605, 90223, 83950], dtype = np.int32),
+                         'Total Deaths': [1.5, np.nan, 30.0, 2.0, 400.0]})
+
+def test_int_column_sorts_numerically():
+    x = table()
+    orders = sortOrders(x)
+    assert x['Total Cases'].to_numpy()[orders['Total Cases', 'desc']].tolist() == [91292, 90223, 83950, 8605, 812]
+    assert x['Total Cases'].to_numpy()[orders['Total Cases', 'asc']].tolist() == [812, 8605, 83950, 90223, 91292]
+
+def test_page_sorted_by_int_column():
+    x = table()
+    records, page_count = pageRecords(x, sortOrders(x), 0, 3, [{'column_id': 'Total Cases', 'direction': 'desc'}], '')
+    assert [record['Country'] for record in records] == ['B', 'D', 'E']
+    assert page_count == 2
+
+def test_text_column_sorts_by_name():
+    x = table().iloc[::-1].reset_index(drop = True)
+    orders = sortOrders(x)
+    assert x['Country'].to_numpy()[orders['Country', 'asc']].tolist() == ['A', 'B', 'C', 'D', 'E']
+
+@pytest.mark.parametrize('filter_part, expected', [
+    ('{Country} scontains Isle of', ('Country', 'contains', 'Isle of')),
+    ('{Country} icontains le', ('Country', 'contains', 'le')),
+    ('{Country} contains "a && b"', ('Country', 'contains', 'a && b')),
+    ('{Country} scontains 7', ('Country', 'contains', '7')),
+    ('{Country} s= Isle of Man', ('Country', 'eq', 'Isle of Man')),
+    ('{Total Cases} s> 100', ('Total Cases', 'gt', 100.0)),
+    ('{Total Cases} >=100', ('Total Cases', 'ge', 100.0)),
+    ('{Total Cases} ine 3', ('Total Cases', 'ne', 3.0)),
+    ('{Total Deaths} le 2.5', ('Total Deaths', 'le', 2.5)),
+    ('{Country} nexus', (None, None, None)),
+    ('Country contains a', (None, None, None)),
+])
+def test_split_filter_part(filter_part, expected):
+    assert tuple(splitFilterPart(filter_part)) == expected
+
+def test_contains_value_with_an_operator_word():
+    x = pd.DataFrame({'Country': ['Isle of Man', 'Iceland', 'Chile', 'Country 7', 'Country 17']})
+    assert x['Country'][filterMask(x, '{Country} scontains Isle of')].tolist() == ['Isle of Man']
+    assert x['Country'][filterMask(x, '{Country} scontains 7')].tolist() == ['Country 7', 'Country 17']
+
+def test_number_filters():
+    x = table()
+    assert x['Country'][filterMask(x, '{Total Cases} s> 10000 && {Total Deaths} s< 100')].tolist() == ['D']
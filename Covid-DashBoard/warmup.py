@@ -0,0 +1,59 @@
+import collections
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+class WarmUp:
+    #Runs cache filling tasks on background daemon threads and keeps count of the progress
+    def __init__(self, threads = 2):
+        self.threads = threads
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def start(self, name, tasks):
+        #tasks are callables, starting again makes the unfinished tasks of the last run skip
+        with self.lock:
+            self.generation += 1
+            self.total, self.done, self.failed, self.seconds = len(tasks), 0, 0, 0.0
+            generation = self.generation
+        queue = collections.deque(tasks)
+        started = time.perf_counter()
+        log.info("warm-up of %s started, %d tasks on %d threads", name, len(tasks), self.threads)
+        for i in range(self.threads):
+            threading.Thread(target = self.work, args = (name, generation, queue, started),
+                             name = 'warm-up-%d' % i, daemon = True).start()
+
+    def work(self, name, generation, queue, started):
+        step = max(1, self.total // 10)
+        while generation == self.generation:
+            try:
+                task = queue.popleft()
+            except IndexError:
+                return
+            try:
+                task()
+                failed = 0
+            except Exception:
+                log.exception("warm-up task of %s failed", name)
+                failed = 1
+            with self.lock:
+                if generation != self.generation:
+                    return
+                self.done += 1
+                self.failed += failed
+                self.seconds = time.perf_counter() - started
+                if self.done == self.total:
+                    log.info("warm-up of %s finished, %d tasks (%d failed) in %.1fs",
+                             name, self.total, self.failed, self.seconds)
+                elif self.done % step == 0:
+                    log.info("warm-up of %s at %d/%d after %.1fs", name, self.done, self.total, self.seconds)
+
+    def stats(self):
+        with self.lock:
+            return {'total': self.total, 'done': self.done, 'failed': self.failed, 'seconds': self.seconds}
@@ -0,0 +1,12 @@
+import gc
+
+from app import app, prepare
+
+server = app.server
+
+#The master loads the data and builds the layout before forking, so every worker shares them
+prepare()
+
+#Move everything loaded so far out of the collector's reach, so the GC of a forked
+#worker does not write to (and privately copy) pages it shares with the master
+gc.freeze()